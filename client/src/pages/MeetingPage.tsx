@@ -8,7 +8,6 @@ import { Separator } from "@/components/ui/separator";
 import { toast } from "@/hooks/use-toast";
 
 const WS_URL = "ws://localhost:8003/ws/orchestrator";
-const LLM_LIVE_URL = "http://localhost:8001/generate_answer";
 const LLM_SUMMARY_URL = "http://localhost:8001/summarize";
 
 const MeetingPage: React.FC = () => {
@@ -21,8 +20,6 @@ const MeetingPage: React.FC = () => {
   const [transcripts, setTranscripts] = useState<{id:number; text:string; timestamp:string}[]>([]);
   const [questions,  setQuestions ] = useState<{id:number; text:string; timestamp:string}[]>([]);
   const [answers,    setAnswers   ] = useState<{id:number; question:string; answer:string; timestamp:string}[]>([]);
-  const [visionTexts, setVisionTexts] = useState<string[]>([]);
-  const [uiElements,  setUiElements ]  = useState<string[]>([]);
   const [summary,     setSummary    ]  = useState<string>("");
   const [tasks,       setTasks      ]  = useState<string[]>([]);
   const [activeTab,   setActiveTab  ]  = useState<"transcript"|"qa"|"summary">("transcript");
@@ -31,22 +28,41 @@ const MeetingPage: React.FC = () => {
   const canvasRef   = useRef<HTMLCanvasElement>(null);
   const recorderRef = useRef<MediaRecorder>();
   const socketRef   = useRef<WebSocket>();
+  const meetingIdRef = useRef<string|null>(null);
+  // Diapositiva en pantalla: el orquestador guarda su OCR/UI y las preguntas solo la citan por id
+  const slideIdRef   = useRef<string|null>(null);
 
   // Setup WebSocket
 // Setup WebSocket
 useEffect(() => {
-  const ws = new WebSocket(WS_URL);
-  socketRef.current = ws;
-  
+  let ws: WebSocket;
+  let disposed = false;
+  let redirectUrl: string | null = null;
+  let redirects = 0;
+
   const handleMessage = (evt: MessageEvent) => {
     try {
       const msg = JSON.parse(evt.data);
       const now = new Date().toLocaleTimeString();
 
       switch (msg.type) {
+        case "session":
+          meetingIdRef.current = msg.data.meeting_id;
+          slideIdRef.current = msg.data.slide_id ?? null;
+          redirects = 0;
+          if (msg.data.resumed) {
+            toast({ title: "Reunión retomada", description: msg.data.worker });
+          }
+          break;
+
+        case "redirect":
+          // Otro worker del orquestador es dueño de esta reunión
+          meetingIdRef.current = msg.data.meeting_id;
+          redirectUrl = msg.data.url;
+          break;
+
         case "frame_processed":
-          setVisionTexts(prev => [...prev, ...msg.data.text]);
-          setUiElements(prev => [...prev, ...msg.data.ui_elements]);
+          slideIdRef.current = msg.data.slide_id;
           break;
 
         case "transcript":
@@ -72,7 +88,7 @@ useEffect(() => {
             ...prev,
             {
               id: Date.now(),
-              question: "What is this section about?",
+              question: msg.question ?? "What is this section about?",
               answer: msg.data,
               timestamp: now
             }
@@ -103,14 +119,32 @@ useEffect(() => {
     }
   };
 
+  const connect = (url: string) => {
+    ws = new WebSocket(url);
+    socketRef.current = ws;
+    ws.addEventListener("message", handleMessage);
+    ws.addEventListener("close", handleClose);
+  };
+
   const handleClose = () => {
     console.log("Conexión WebSocket cerrada");
+    if (disposed) return;
+    if (redirectUrl && redirects < 3) {
+      redirects++;
+      const url = redirectUrl;
+      redirectUrl = null;
+      connect(url);
+      return;
+    }
+    // Reconectar retomando la reunión (el estado de la sesión se guarda en el servidor)
+    const url = meetingIdRef.current ? `${WS_URL}?meeting_id=${meetingIdRef.current}` : WS_URL;
+    setTimeout(() => { if (!disposed) connect(url); }, 1000);
   };
 
-  ws.addEventListener("message", handleMessage);
-  ws.addEventListener("close", handleClose);
+  connect(WS_URL);
 
   return () => {
+    disposed = true;
     ws.removeEventListener("message", handleMessage);
     ws.removeEventListener("close", handleClose);
     ws.close();
@@ -140,22 +174,16 @@ useEffect(() => {
     return () => window.clearInterval(interval);
   }, [isSharing]);
 
-  // Live AI via LLM service (fallback)
-  const liveAnswer = async (question:string) => {
-    try {
-      const res = await fetch(LLM_LIVE_URL, {
-        method: "POST",
-        headers: {"Content-Type":"application/json"},
-        body: JSON.stringify({ text:[...visionTexts, question], ui:uiElements, audio_meta:question })
-      });
-      const { answer } = await res.json();
-      if (answer) {
-        const now = new Date().toLocaleTimeString();
-        setAnswers(a=>[...a, {id:Date.now(), question, answer, timestamp:now}]);
-      }
-    } catch(e){
-      console.error("Live answer error", e);
+  // Pregunta manual: el orquestador responde con el contexto cacheado de la diapositiva (llega como "answer")
+  const liveAnswer = (question:string, slideId:string|null = slideIdRef.current) => {
+    if (socketRef.current?.readyState !== WebSocket.OPEN) {
+      console.error("Live answer error: WebSocket no conectado");
+      return;
     }
+    socketRef.current.send(JSON.stringify({
+      type: "question",
+      data: { text: question, slide_id: slideId }
+    }));
   };
 
   const handleStartSharing = async () => {
@@ -166,7 +194,8 @@ useEffect(() => {
       setShareStartTime(now.toLocaleTimeString());
       setShareEndTime(null); setDuration(null);
       setSummary(""); setTasks([]);
-      setVisionTexts([]); setUiElements([]); setTranscripts([]); setQuestions([]); setAnswers([]);
+      slideIdRef.current = null;
+      setTranscripts([]); setQuestions([]); setAnswers([]);
       setActiveTab("transcript");
       setIsSharing(true);
       toast({title:"Screen sharing started"});
@@ -195,6 +224,15 @@ useEffect(() => {
       const data = await res.json();
       setSummary(data.summary);
       setTasks(data.tasks);
+      // Persistir el resumen en el historial de la reunión y darla por terminada
+      if (socketRef.current?.readyState === WebSocket.OPEN) {
+        socketRef.current.send(JSON.stringify({
+          type: "summary",
+          data: { summary: data.summary, tasks: data.tasks }
+        }));
+        socketRef.current.send(JSON.stringify({ type: "end" }));
+        meetingIdRef.current = null;
+      }
       setActiveTab("summary");
     } catch(e){
       console.error(e);
@@ -0,0 +1,175 @@
+import os
+import mmap
+import uuid
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+# Marcadores EBML de un stream WebM (MediaRecorder solo envía la cabecera en el primer blob)
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+CLUSTER_ID = b"\x1f\x43\xb6\x75"
+
+
+def webm_header(data: bytes) -> Optional[bytes]:
+    if not data.startswith(EBML_MAGIC):
+        return None
+    idx = data.find(CLUSTER_ID)
+    return data[:idx] if idx > 0 else None
+
+
+@dataclass
+class Record:
+    """Un upload de audio dentro del ring, con su posición en la línea de tiempo de la sesión."""
+    segment: int
+    offset: int
+    length: int
+    start: float
+    duration: float
+    stream: Optional[str]   # hash de la cabecera WebM: solo se concatenan clusters del mismo stream
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+
+class SegmentRing:
+    """Ring del audio comprimido (WebM/Opus tal como llega) de una sesión.
+
+    Los bytes se escriben en `segments` ficheros de tamaño fijo mapeados en
+    memoria; en RAM solo vive el índice. Cuando el segmento actual se llena se
+    reutiliza el más antiguo, así que el disco ocupado está acotado desde el
+    principio y nunca crece.
+    """
+
+    def __init__(self, directory: Path, segment_bytes: int, segments: int, max_seconds: float):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_seconds = max_seconds
+        self.records: deque[Record] = deque()
+        self.timeline = 0.0     # fin del último registro, en segundos de la sesión
+        self.dropped = 0
+        self._segment = 0
+        self._pos = 0
+        self._lock = threading.Lock()
+        directory.mkdir(parents=True, exist_ok=True)
+        self._maps: list[mmap.mmap] = []
+        for i in range(segments):
+            with open(directory / f"segment_{i}.bin", "w+b") as f:
+                f.truncate(segment_bytes)
+                self._maps.append(mmap.mmap(f.fileno(), segment_bytes))
+
+    def append(self, data: bytes, duration: float) -> Optional[Record]:
+        header = webm_header(data)
+        stream = hashlib.sha1(header).hexdigest()[:16] if header else None
+        with self._lock:
+            start = self.timeline
+            self.timeline += duration
+            if len(data) > self.segment_bytes:
+                self.dropped += 1
+                return None
+            if self._pos + len(data) > self.segment_bytes:
+                self._segment = (self._segment + 1) % len(self._maps)
+                self._pos = 0
+                # Lo que había en el segmento reutilizado deja de existir
+                self.records = deque(r for r in self.records if r.segment != self._segment)
+            self._maps[self._segment][self._pos:self._pos + len(data)] = data
+            record = Record(self._segment, self._pos, len(data), start, duration, stream)
+            self._pos += len(data)
+            self.records.append(record)
+            while self.records and self.records[0].end < self.timeline - self.max_seconds:
+                self.records.popleft()
+            return record
+
+    def last(self, seconds: float) -> list[Record]:
+        """Registros que cubren los últimos `seconds` segundos retenidos."""
+        with self._lock:
+            since = self.timeline - seconds
+            picked = []
+            for record in reversed(self.records):
+                picked.append(record)
+                if record.start <= since:
+                    break
+            return picked[::-1]
+
+    def streams(self, records: list[Record]) -> list[tuple[float, bytes]]:
+        """Agrupa registros consecutivos del mismo stream en WebM decodificables: (inicio, bytes).
+
+        El orquestador antepone la cabecera a cada lote; dentro de un grupo se
+        conserva la del primero y del resto solo los clusters.
+        """
+        groups: list[tuple[float, bytearray]] = []
+        current = None
+        with self._lock:
+            for record in records:
+                data = self._maps[record.segment][record.offset:record.offset + record.length]
+                if current is not None and record.stream and record.stream == current:
+                    idx = data.find(CLUSTER_ID)
+                    groups[-1][1].extend(data[idx:] if idx > 0 else data)
+                else:
+                    groups.append((record.start, bytearray(data)))
+                current = record.stream
+        return [(start, bytes(data)) for start, data in groups]
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "records": len(self.records),
+                "retained_seconds": round(sum(r.duration for r in self.records), 2),
+                "retained_bytes": sum(r.length for r in self.records),
+                "timeline_seconds": round(self.timeline, 2),
+                "dropped": self.dropped
+            }
+
+    def close(self):
+        with self._lock:
+            for m in self._maps:
+                m.close()
+            self._maps = []
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class RingRegistry:
+    """Rings por sesión con expulsión LRU (cada uno ocupa segment_bytes × segments en disco).
+
+    Cada proceso trabaja en su propio subdirectorio de `root` y solo borra ese:
+    `root` puede ser compartido (p. ej. /tmp o varios workers de audio-service).
+    """
+
+    def __init__(self, root: Path, segment_bytes: int, segments: int, max_seconds: float,
+                 max_sessions: int = 64):
+        self.root = root / f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.segment_bytes = segment_bytes
+        self.segments = segments
+        self.max_seconds = max_seconds
+        self.max_sessions = max_sessions
+        self._rings: OrderedDict[str, SegmentRing] = OrderedDict()
+
+    def get(self, session_id: str, create: bool = True) -> Optional[SegmentRing]:
+        ring = self._rings.pop(session_id, None)
+        if ring is None:
+            if not create:
+                return None
+            key = hashlib.sha1(session_id.encode()).hexdigest()[:16]
+            ring = SegmentRing(self.root / key, self.segment_bytes, self.segments, self.max_seconds)
+        self._rings[session_id] = ring
+        while len(self._rings) > self.max_sessions:
+            _, evicted = self._rings.popitem(last=False)
+            evicted.close()
+        return ring
+
+    def drop(self, session_id: str) -> bool:
+        ring = self._rings.pop(session_id, None)
+        if ring is None:
+            return False
+        ring.close()
+        return True
+
+    def close(self):
+        for ring in self._rings.values():
+            ring.close()
+        self._rings.clear()
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -5,8 +5,11 @@ import base64
 import tempfile
 import subprocess
 import mimetypes
-from fastapi import FastAPI, File, UploadFile, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+import wave
+from pathlib import Path
+from typing import Optional
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import whisper
@@ -14,6 +17,12 @@ import webrtcvad
 import torchaudio
 from simple_diarizer.diarizer import Diarizer
 import torch
+import numpy as np
+
+from app.audio_ring import RingRegistry
+from app.questions import DetectorRegistry, QuestionDetector, Segment
+from app.profiling import Profiler
+from app.telemetry import Telemetry
 
 import time
 time.sleep(0.1)
@@ -37,16 +46,35 @@ SUPPORTED_MIME_TYPES = {
 # Configuración de dispositivo
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
-# Cargar modelos
+telemetry = Telemetry("audio-service")
+
+# Cargar modelos (el tiempo de carga se expone en /metrics)
+t0 = time.perf_counter()
 model = whisper.load_model(env_model, device=device)
+telemetry.model_loaded(f"whisper-{env_model}", time.perf_counter() - t0)
 vad = webrtcvad.Vad(1)
+t0 = time.perf_counter()
 diag = Diarizer()
+telemetry.model_loaded("diarizer", time.perf_counter() - t0)
+# Estado del detector de preguntas por sesión del orquestador
+detectors = DetectorRegistry()
+# Audio reciente por sesión (comprimido, en segmentos mmap acotados) para reproducir o re-transcribir
+rings = RingRegistry(
+    Path(os.getenv("AUDIO_RING_DIR", os.path.join(tempfile.gettempdir(), "audio_ring"))),
+    segment_bytes=int(os.getenv("AUDIO_RING_SEGMENT_BYTES", str(1024 * 1024))),
+    segments=int(os.getenv("AUDIO_RING_SEGMENTS", "8")),
+    max_seconds=float(os.getenv("AUDIO_RING_SECONDS", "600")),
+    max_sessions=int(os.getenv("AUDIO_RING_SESSIONS", "64"))
+)
 
 app = FastAPI(
     title="Audio Service",
     description="Transcribe audio, diarizar y detectar preguntas",
     version="0.4.0"
 )
+telemetry.install(app)
+profiler = Profiler("audio-service")
+profiler.install(app)
 
 class QuestionDetectRequest(BaseModel):
     transcript: str
@@ -54,6 +82,28 @@ class QuestionDetectRequest(BaseModel):
 class QuestionDetectResponse(BaseModel):
     questions: list[str]
 
+class TranscriptSegment(BaseModel):
+    text: str
+    start: float = 0.0
+    end: float = 0.0
+
+class DetectedQuestion(BaseModel):
+    text: str
+    confidence: float
+    start: Optional[float] = None
+    end: Optional[float] = None
+
+class StreamDetectRequest(BaseModel):
+    session_id: str
+    segments: list[TranscriptSegment]
+    final: bool = False
+    # Fin del audio transcrito en la línea de tiempo de la sesión (también en lotes sin texto)
+    now: Optional[float] = None
+
+class StreamDetectResponse(BaseModel):
+    questions: list[DetectedQuestion]
+    pending: Optional[DetectedQuestion] = None
+
 # Modificar la función de conversión FFmpeg
 def convert_audio_ffmpeg(input_data: bytes) -> bytes:
     try:
@@ -97,8 +147,54 @@ def convert_audio_ffmpeg(input_data: bytes) -> bytes:
         raise RuntimeError("Tiempo de conversión excedido (20s)")
 
 # Actualizar el endpoint de transcripción
+def run_whisper(audio) -> dict:
+    """Whisper sobre una ruta o un array float32 a 16 kHz (/transcribe y modo batch)"""
+    with telemetry.stage("whisper_transcribe"), profiler.inference("whisper"):
+        result = model.transcribe(audio)
+    return {
+        "transcript": result.get("text", "").strip(),
+        # Segmentos con tiempos para el detector incremental de preguntas
+        "segments": [{
+            "start": float(s["start"]),
+            "end": float(s["end"]),
+            "text": s["text"].strip()
+        } for s in result.get("segments", [])]
+    }
+
+def diarize_wav(wav_path: str, num_speakers: int = 2) -> list[dict]:
+    with telemetry.stage("diarize"), profiler.inference("diarize"):
+        segments = diag.diarize(wav_path, num_speakers=num_speakers)
+    return [{
+        "start": float(s.get("start", 0)),
+        "end": float(s.get("end", 0)),
+        "speaker": f"Speaker {s.get('label', '')}"
+    } for s in segments]
+
+def wav_pcm(wav_data: bytes) -> bytes:
+    """PCM s16le del WAV de ffmpeg (por pipe el tamaño del chunk data no es fiable).
+
+    Se recorren los chunks (fmt, LIST, ...) en vez de asumir una cabecera de 44 bytes.
+    """
+    pos = 12
+    while pos + 8 <= len(wav_data):
+        chunk_id = wav_data[pos:pos + 4]
+        size = int.from_bytes(wav_data[pos + 4:pos + 8], "little")
+        if chunk_id == b"data":
+            return wav_data[pos + 8:]
+        pos += 8 + size + (size & 1)
+    return b""
+
+def pcm_to_wav(pcm: bytes) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(pcm)
+    return buf.getvalue()
+
 @app.post("/transcribe")
-async def transcribe_audio(file: UploadFile = File(...)):
+async def transcribe_audio(file: UploadFile = File(...), session_id: Optional[str] = None):
     """Endpoint mejorado con manejo de errores detallado"""
     try:
         # Validaciones básicas
@@ -116,7 +212,12 @@ async def transcribe_audio(file: UploadFile = File(...)):
             )
 
         # Conversión a WAV
-        wav_data = convert_audio_ffmpeg(data)
+        with telemetry.stage("ffmpeg_decode"):
+            wav_data = convert_audio_ffmpeg(data)
+        duration = len(wav_pcm(wav_data)) / (16000 * 2)
+        # Se retiene ya validado por ffmpeg: si Whisper falla se puede repetir sin re-subirlo
+        if session_id:
+            rings.get(session_id).append(data, duration)
         
         # Usar archivo temporal con nombre explícito
         with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
@@ -124,10 +225,11 @@ async def transcribe_audio(file: UploadFile = File(...)):
             audio_path = tmp.name
         
         # Transcribir
-        result = model.transcribe(audio_path)
+        result = run_whisper(audio_path)
         os.unlink(audio_path)  # Limpiar siempre
         
-        return {"transcript": result.get("text", "").strip()}
+        result["duration"] = duration
+        return result
 
     except Exception as e:
         print(f"Error crítico en transcripción: {str(e)}")
@@ -138,32 +240,119 @@ async def transcribe_audio(file: UploadFile = File(...)):
 
 @app.post("/detect_questions", response_model=QuestionDetectResponse)
 async def detect_questions(req: QuestionDetectRequest):
-    """Detecta preguntas en el texto transcrito"""
-    txt = req.transcript.strip().replace('¿', '?')
-    questions = [f"{p}?" for p in txt.split('?') if p.strip()]
-    return QuestionDetectResponse(questions=questions[:-1])  # Excluir último fragmento vacío
+    """Detecta preguntas en el texto transcrito completo (sin estado)"""
+    found = QuestionDetector().feed([Segment(text=req.transcript)], final=True)
+    return QuestionDetectResponse(questions=[q["text"] for q in found])
+
+@app.post("/detect_questions/stream", response_model=StreamDetectResponse)
+async def detect_questions_stream(req: StreamDetectRequest):
+    """Detección incremental: recibe solo los segmentos nuevos de la sesión"""
+    detector = detectors.get(req.session_id)
+    with telemetry.stage("question_detect"):
+        found = detector.feed(
+            [Segment(text=s.text, start=s.start, end=s.end) for s in req.segments],
+            final=req.final,
+            now=req.now
+        )
+    if req.final:
+        detectors.drop(req.session_id)
+    return StreamDetectResponse(
+        questions=[DetectedQuestion(**q) for q in found],
+        pending=detector.pending()
+    )
+
+@app.delete("/detect_questions/stream/{session_id}")
+async def reset_question_stream(session_id: str):
+    return {"dropped": detectors.drop(session_id)}
+
+def recent_audio(session_id: str, seconds: float) -> tuple[float, bytes]:
+    """PCM 16 kHz de los últimos `seconds` s retenidos y su inicio en la línea de tiempo de la sesión."""
+    ring = rings.get(session_id, create=False)
+    records = ring.last(seconds) if ring else []
+    if not records:
+        raise HTTPException(404, "No hay audio retenido para esta sesión")
+    pcm = bytearray()
+    for _, webm in ring.streams(records):
+        with telemetry.stage("ffmpeg_decode"):
+            pcm.extend(wav_pcm(convert_audio_ffmpeg(webm)))
+    start = records[0].start
+    excess = len(pcm) - int(seconds * 16000) * 2
+    if excess > 0:
+        del pcm[:excess]
+        start += excess / (16000 * 2)
+    return start, bytes(pcm)
+
+@app.get("/sessions/{session_id}/audio")
+async def session_audio(
+    session_id: str,
+    seconds: float = Query(30.0, gt=0),
+    format: str = Query("wav", pattern="^(wav|webm)$")
+):
+    """Últimos N segundos de audio de la sesión: WAV decodificado o el WebM/Opus tal como llegó."""
+    if format == "webm":
+        ring = rings.get(session_id, create=False)
+        streams = ring.streams(ring.last(seconds)) if ring else []
+        if not streams:
+            raise HTTPException(404, "No hay audio retenido para esta sesión")
+        if len(streams) > 1:
+            raise HTTPException(409, "El tramo abarca varios streams WebM; usa format=wav")
+        start, data = streams[0]
+        media_type = "audio/webm"
+    else:
+        start, pcm = recent_audio(session_id, seconds)
+        data, media_type = pcm_to_wav(pcm), "audio/wav"
+    return Response(data, media_type=media_type, headers={"X-Audio-Start": f"{start:.3f}"})
+
+@app.get("/sessions/{session_id}/audio/info")
+async def session_audio_info(session_id: str):
+    ring = rings.get(session_id, create=False)
+    if ring is None:
+        raise HTTPException(404, "No hay audio retenido para esta sesión")
+    return ring.info()
+
+@app.post("/sessions/{session_id}/replay")
+async def replay_session_audio(session_id: str, seconds: float = Query(30.0, gt=0), detect: bool = False):
+    """Vuelve a pasar los últimos N segundos por Whisper (y opcionalmente por el detector de preguntas)."""
+    start, pcm = recent_audio(session_id, seconds)
+    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    result = run_whisper(audio)
+    for s in result["segments"]:
+        s["start"] += start
+        s["end"] += start
+    result["offset"] = start
+    result["duration"] = len(pcm) / (16000 * 2)
+    if detect:
+        result["questions"] = QuestionDetector().feed(
+            [Segment(text=s["text"], start=s["start"], end=s["end"]) for s in result["segments"]],
+            final=True
+        )
+    return result
+
+@app.delete("/sessions/{session_id}")
+async def release_session(session_id: str):
+    """Fin de la sesión en el orquestador: libera detector de preguntas y audio retenido."""
+    return {"detector": detectors.drop(session_id), "audio": rings.drop(session_id)}
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    rings.close()
 
 @app.post("/diarize")
 async def diarize_audio(file: UploadFile = File(...), num_speakers: int = 2):
     """Diarización de audio con preprocesamiento FFmpeg"""
     try:
         data = await file.read()
-        wav_data = convert_audio_ffmpeg(data)
+        with telemetry.stage("ffmpeg_decode"):
+            wav_data = convert_audio_ffmpeg(data)
         
         with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
             tmp.write(wav_data)
             wav_path = tmp.name
             
-        segments = diag.diarize(wav_path, num_speakers=num_speakers)
+        segments = diarize_wav(wav_path, num_speakers)
         os.unlink(wav_path)  # Limpiar archivo temporal
         
-        return JSONResponse(content={
-            "segments": [{
-                "start": float(s.get("start", 0)),
-                "end": float(s.get("end", 0)),
-                "speaker": f"Speaker {s.get('label', '')}"
-            } for s in segments]
-        })
+        return JSONResponse(content={"segments": segments})
         
     except Exception as e:
         print(f"[diarize] Error: {str(e)}")
@@ -194,8 +383,10 @@ async def audio_websocket(ws: WebSocket):
             if len(buffer) >= 3 * 16000 * 2:  # ~3 segundos de audio 16kHz 16-bit
                 try:
                     # Convertir y transcribir
-                    wav_data = convert_audio_ffmpeg(bytes(buffer))
-                    with io.BytesIO(wav_data) as audio_buffer:
+                    with telemetry.stage("ffmpeg_decode"):
+                        wav_data = convert_audio_ffmpeg(bytes(buffer))
+                    with io.BytesIO(wav_data) as audio_buffer, telemetry.stage("whisper_transcribe"), \
+                            profiler.inference("whisper"):
                         result = model.transcribe(audio_buffer.name)
                     
                     await ws.send_json({
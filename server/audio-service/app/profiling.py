@@ -0,0 +1,227 @@
+import os
+import sys
+import hmac
+import time
+import asyncio
+import tempfile
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from starlette.background import BackgroundTask
+
+try:
+    import torch
+    import torch.profiler
+except ImportError:  # llm-service y el orquestador no dependen de torch
+    torch = None
+
+ADMIN_HEADER = "X-Admin-Token"
+MAX_PROFILE_SECONDS = 120
+MAX_TORCH_CAPTURES = 20
+
+
+def frame_label(code) -> str:
+    return f"{Path(code.co_filename).stem}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Muestrea las pilas Python de todos los hilos del proceso con sys._current_frames().
+
+    No instrumenta nada: cuando no hay captura en curso el coste es cero.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Reserva el muestreador sin esperar; False si ya hay una captura en curso."""
+        return self._lock.acquire(blocking=False)
+
+    def release(self):
+        self._lock.release()
+
+    def sample(self, seconds: float, interval: float) -> tuple[Counter, int]:
+        """Devuelve (pilas colapsadas → nº de muestras, nº de barridos). Requiere acquire() previo."""
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        sweeps = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(stack))] += 1
+            sweeps += 1
+            time.sleep(interval)
+        return stacks, sweeps
+
+    @staticmethod
+    def collapsed(stacks: Counter) -> str:
+        """Formato "pila;colapsada N" de flamegraph.pl / speedscope / inferno."""
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+    @staticmethod
+    def speedscope(stacks: Counter, interval: float, name: str) -> dict[str, Any]:
+        frames: dict[str, int] = {}
+        samples, weights = [], []
+        for stack, count in stacks.items():
+            samples.append([frames.setdefault(f, len(frames)) for f in stack.split(";")])
+            weights.append(count * interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": f} for f in frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            }]
+        }
+
+
+class TorchCapture:
+    """Perfila con torch.profiler las próximas K llamadas de inferencia marcadas."""
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = out_dir
+        self.remaining = 0
+        self.captures: deque[dict[str, Any]] = deque(maxlen=MAX_TORCH_CAPTURES)
+        self._lock = threading.Lock()
+
+    def arm(self, calls: int):
+        if torch is None:
+            raise RuntimeError("torch no está instalado en este servicio")
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self.remaining = calls
+
+    def _take(self) -> bool:
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    @contextmanager
+    def inference(self, name: str):
+        """Envuelve una llamada al modelo; solo perfila si hay capturas pendientes."""
+        if torch is None or not self._take():
+            yield
+            return
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        with torch.profiler.profile(activities=activities, record_shapes=True) as prof:
+            yield
+        trace_file = self.out_dir / f"{name}_{int(time.time() * 1000)}.json"
+        prof.export_chrome_trace(str(trace_file))
+        if len(self.captures) == self.captures.maxlen:
+            self.discard_trace(self.captures[0])
+        self.captures.append({
+            "name": name,
+            "created": time.time(),
+            "trace_file": str(trace_file),
+            "table": prof.key_averages().table(sort_by="self_cpu_time_total", row_limit=25)
+        })
+
+    @staticmethod
+    def discard_trace(capture: dict[str, Any]):
+        """Borra la traza Chrome de una captura (se sirve una sola vez)."""
+        trace_file, capture["trace_file"] = capture.get("trace_file"), None
+        if trace_file:
+            Path(trace_file).unlink(missing_ok=True)
+
+
+class Profiler:
+    """Endpoints /admin/profile y /admin/torch_profile protegidos por ADMIN_TOKEN."""
+
+    def __init__(self, service: str, admin_token: Optional[str] = None):
+        self.service = service
+        self.admin_token = admin_token if admin_token is not None else os.getenv("ADMIN_TOKEN")
+        self.sampler = SamplingProfiler()
+        self.torch = TorchCapture(Path(tempfile.gettempdir()) / "torch_profiles" / service)
+
+    def inference(self, name: str):
+        return self.torch.inference(name)
+
+    def _require_admin(self, token: Optional[str] = Header(None, alias=ADMIN_HEADER)):
+        # Sin ADMIN_TOKEN configurado los endpoints no existen a efectos prácticos
+        if not self.admin_token:
+            raise HTTPException(404, "Perfilado deshabilitado")
+        if not hmac.compare_digest((token or "").encode(), self.admin_token.encode()):
+            raise HTTPException(403, "Token de administración inválido")
+
+    def install(self, app: FastAPI):
+        admin = [Depends(self._require_admin)]
+
+        @app.post("/admin/profile", dependencies=admin, include_in_schema=False)
+        async def profile(
+            seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+            interval_ms: float = Query(5.0, ge=1.0, le=1000.0),
+            format: str = Query("collapsed", pattern="^(collapsed|speedscope)$")
+        ):
+            """Captura un perfil muestreado de todo el proceso durante `seconds`."""
+            if not self.sampler.acquire():
+                raise HTTPException(409, "Ya hay una captura en curso")
+            interval = interval_ms / 1000
+            try:
+                # El muestreo corre en un hilo aparte: el event loop sigue atendiendo tráfico
+                stacks, sweeps = await asyncio.to_thread(self.sampler.sample, seconds, interval)
+            finally:
+                self.sampler.release()
+            filename = f"{self.service}_{int(time.time())}"
+            headers = {"X-Profile-Sweeps": str(sweeps)}
+            if format == "speedscope":
+                headers["Content-Disposition"] = f'attachment; filename="{filename}.speedscope.json"'
+                return JSONResponse(self.sampler.speedscope(stacks, interval, filename), headers=headers)
+            headers["Content-Disposition"] = f'attachment; filename="{filename}.collapsed.txt"'
+            return PlainTextResponse(self.sampler.collapsed(stacks), headers=headers)
+
+        @app.post("/admin/torch_profile", dependencies=admin, include_in_schema=False)
+        async def arm_torch_profile(calls: int = Query(5, ge=1, le=100)):
+            """Arma torch.profiler para las próximas `calls` inferencias."""
+            try:
+                self.torch.arm(calls)
+            except RuntimeError as e:
+                raise HTTPException(501, str(e))
+            return {"armed": calls}
+
+        @app.get("/admin/torch_profile", dependencies=admin, include_in_schema=False)
+        async def torch_profile_status():
+            return {
+                "remaining": self.torch.remaining,
+                "captures": [
+                    {k: v for k, v in c.items() if k != "table"} | {"id": i}
+                    for i, c in enumerate(self.torch.captures)
+                ]
+            }
+
+        @app.get("/admin/torch_profile/{capture_id}", dependencies=admin, include_in_schema=False)
+        async def torch_profile_capture(capture_id: int, trace: bool = False):
+            """Tabla de operadores de una captura, o su traza Chrome con ?trace=true (una sola descarga)."""
+            if not 0 <= capture_id < len(self.torch.captures):
+                raise HTTPException(404, "Captura no encontrada")
+            capture = self.torch.captures[capture_id]
+            if trace:
+                if not capture["trace_file"]:
+                    raise HTTPException(410, "La traza ya se descargó")
+                return FileResponse(
+                    capture["trace_file"],
+                    media_type="application/json",
+                    background=BackgroundTask(self.torch.discard_trace, capture)
+                )
+            return PlainTextResponse(capture["table"])
@@ -0,0 +1,206 @@
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+# ——— Rasgos léxicos (inglés y español) ————————————————————————————————————
+INTERROGATIVES = {
+    "what", "why", "how", "when", "where", "who", "whom", "whose", "which",
+    "qué", "cómo", "cuándo", "dónde", "adónde", "quién", "quiénes", "cuál", "cuáles",
+    "cuánto", "cuánta", "cuántos", "cuántas",
+    # Whisper a veces omite la tilde; sin ella solo cuentan al inicio de la frase
+    "cual", "cuales", "quien", "quienes", "donde", "cuanto", "cuantos", "que", "como", "cuando"
+}
+# Interrogativos que, aun sin ir al inicio, delatan una pregunta ("so what do we...")
+EMBEDDED_INTERROGATIVES = {"what", "why", "how", "qué", "cómo", "cuándo", "dónde", "quién", "cuál", "cuánto"}
+INTERROGATIVE_PHRASES = {
+    "por qué", "para qué", "de qué", "en qué", "con quién", "how many", "how much",
+    "por que", "para que", "de que", "en que", "con quien"
+}
+AUXILIARIES = {
+    "is", "are", "was", "were", "am", "do", "does", "did", "can", "could", "will",
+    "would", "should", "shall", "have", "has", "had", "may", "might", "must",
+    "isn't", "aren't", "don't", "doesn't", "didn't", "can't", "won't", "wouldn't", "shouldn't"
+}
+SUBJECTS = {"i", "you", "we", "they", "he", "she", "it", "this", "that", "there", "the", "my", "our", "your"}
+# "Do it now", "have this ready": imperativo, no inversión, salvo con sujeto que no puede ser objeto
+IMPERATIVE_AUXILIARIES = {"do", "have"}
+OBJECT_SUBJECTS = {"it", "this", "that", "the", "my", "our", "your"}
+# Preguntas sí/no en español: no hay inversión, pero sí verbos de apertura típicos
+ES_YES_NO_OPENERS = {"puedes", "puede", "podrías", "podemos", "sabes", "sabe", "tienes", "tiene", "hay", "es", "está", "están", "vamos"}
+# Apertura en segunda persona: con un infinitivo o un pronombre detrás pesa como la inversión inglesa
+# ("puedes compartir el enlace", "sabes si llegó", "tienes tú el acta")
+ES_STRONG_OPENERS = {
+    "puedes", "podrías", "podéis", "podrias", "sabes", "sabéis", "tienes", "tenéis", "quieres", "queréis"
+}
+ES_SECOND_PERSON = {"tú", "tu", "usted", "ustedes", "vosotros", "si", "algo", "alguien"}
+ES_INFINITIVE = re.compile(r"\w{2,}(?:ar|er|ir|ír)(?:me|te|se|lo|la|los|las|le|les|nos)?$")
+# Tras "que"/"como"/"cuando" sin tilde: conjunción, no pregunta ("cuando yo llegue", "que sí")
+ES_CLAUSE_STARTERS = {"yo", "él", "ella", "nosotros", "ellos", "sí", "si", "ya"}
+LEAD_FILLERS = {"and", "so", "but", "okay", "ok", "well", "y", "entonces", "pero", "bueno", "oye", "pues"}
+TAG_ENDINGS = {"right", "correct", "verdad", "cierto", "no", "isn't it", "don't you", "aren't you", "ok", "okay"}
+
+W_QUESTION_MARK = 0.6
+W_INTERROGATIVE = 0.5
+W_EMBEDDED_INTERROGATIVE = 0.2
+W_INVERSION = 0.5
+W_AUX_OPENER = 0.2
+W_ES_OPENER = 0.3
+W_TAG = 0.3
+W_PAUSE = 0.1
+RELATIVE_CLAUSE_PENALTY = 0.3
+
+PAUSE_BOUNDARY = 0.8    # silencio (s) que cierra una frase sin puntuación
+MAX_CARRY_CHARS = 400   # una frase sin cerrar más larga se fuerza como límite
+DEFAULT_THRESHOLD = 0.5
+
+# Un punto entre dígitos ("3.5") no cierra la frase
+SENTENCE = re.compile(r"(?:[^.?!]|(?<=\d)\.(?=\d))*(?:[?!]|\.(?!\d))+")
+WORD = re.compile(r"[\wáéíóúñü']+")
+
+
+@dataclass
+class Segment:
+    text: str
+    start: float = 0.0
+    end: float = 0.0
+
+
+def question_score(text: str, pause_after: float = 0.0) -> float:
+    """Confianza [0, 1] de que `text` sea una pregunta, a partir de rasgos léxicos y de pausa."""
+    words = WORD.findall(text.lower())
+    if not words:
+        return 0.0
+
+    score = 0.0
+    stripped = text.strip()
+    explicit = stripped.endswith("?") or "¿" in stripped
+    if explicit:
+        score += W_QUESTION_MARK
+
+    lead = 0
+    while lead < min(2, len(words) - 1) and words[lead] in LEAD_FILLERS:
+        lead += 1
+    first = words[lead]
+    nxt = words[lead + 1] if lead + 1 < len(words) else ""
+
+    if first in INTERROGATIVES or f"{first} {nxt}" in INTERROGATIVE_PHRASES:
+        score += W_INTERROGATIVE
+        # "what I mean is..." / "when we arrive": cláusula relativa, no pregunta
+        if nxt in SUBJECTS - {"this", "that", "the"} or (first in {"que", "como", "cuando"} and nxt in ES_CLAUSE_STARTERS):
+            score -= RELATIVE_CLAUSE_PENALTY
+    elif any(w in EMBEDDED_INTERROGATIVES for w in words[lead + 1:lead + 4]):
+        score += W_EMBEDDED_INTERROGATIVE
+
+    if first in AUXILIARIES:
+        inverted = nxt in SUBJECTS and not (first in IMPERATIVE_AUXILIARIES and nxt in OBJECT_SUBJECTS)
+        score += W_INVERSION if inverted else W_AUX_OPENER
+    elif first in ES_STRONG_OPENERS and (nxt in ES_SECOND_PERSON or ES_INFINITIVE.match(nxt)):
+        score += W_INVERSION
+    elif first in ES_YES_NO_OPENERS:
+        score += W_ES_OPENER
+
+    tail = " ".join(words[-2:])
+    if words[-1] in TAG_ENDINGS or tail in TAG_ENDINGS:
+        score += W_TAG
+
+    if pause_after >= PAUSE_BOUNDARY:
+        score += W_PAUSE
+    # Frases muy cortas sin puntuación ("okay so", "right") suelen ser muletillas
+    if len(words) < 3 and not explicit:
+        score *= 0.5
+    return max(0.0, min(1.0, score))
+
+
+class QuestionDetector:
+    """Detector incremental: consume solo segmentos nuevos y mantiene la frase abierta.
+
+    Cada carácter se examina una sola vez; el único estado es la frase aún sin
+    cerrar (acotada a MAX_CARRY_CHARS) y el final del último segmento, que se
+    usa para medir la pausa hasta el siguiente.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._carry = ""
+        self._carry_start: Optional[float] = None
+        self._last_end: Optional[float] = None
+
+    def _emit(self, text: str, start: float, end: float, pause_after: float, out: list[dict]):
+        text = " ".join(text.split())
+        if not text:
+            return
+        confidence = question_score(text, pause_after)
+        if confidence >= self.threshold:
+            out.append({
+                "text": text,
+                "confidence": round(confidence, 3),
+                "start": round(start, 2),
+                "end": round(end, 2)
+            })
+
+    def _close_carry(self, end: float, pause_after: float, out: list[dict]):
+        if self._carry.strip():
+            start = self._carry_start if self._carry_start is not None else end
+            self._emit(self._carry, start, end, pause_after, out)
+        self._carry = ""
+        self._carry_start = None
+
+    def feed(self, segments: list[Segment], final: bool = False, now: Optional[float] = None) -> list[dict]:
+        """`now`: fin del audio ya transcrito (aunque no traiga texto); el silencio hasta ahí cierra la frase."""
+        out: list[dict] = []
+        for seg in segments:
+            # Una pausa larga antes de este segmento cierra la frase pendiente
+            if self._last_end is not None and self._carry:
+                gap = seg.start - self._last_end
+                if gap >= PAUSE_BOUNDARY:
+                    self._close_carry(self._last_end, gap, out)
+
+            if self._carry_start is None:
+                self._carry_start = seg.start
+            text = f"{self._carry} {seg.text}" if self._carry else seg.text
+
+            pos = 0
+            for m in SENTENCE.finditer(text):
+                self._emit(m.group(), self._carry_start, seg.end, 0.0, out)
+                self._carry_start = seg.start
+                pos = m.end()
+            self._carry = text[pos:].strip()
+            if not self._carry:
+                self._carry_start = None
+            elif len(self._carry) > MAX_CARRY_CHARS:
+                self._close_carry(seg.end, 0.0, out)
+            self._last_end = seg.end
+
+        if final:
+            self._close_carry(self._last_end or 0.0, PAUSE_BOUNDARY, out)
+        elif now is not None and self._carry and self._last_end is not None:
+            # Quien pregunta se calla y espera: la pausa llega sin un segmento detrás
+            gap = now - self._last_end
+            if gap >= PAUSE_BOUNDARY:
+                self._close_carry(self._last_end, gap, out)
+        return out
+
+    def pending(self) -> Optional[dict]:
+        """Frase aún abierta con su confianza actual (para respuestas especulativas)."""
+        if not self._carry.strip():
+            return None
+        return {"text": self._carry, "confidence": round(question_score(self._carry), 3)}
+
+
+class DetectorRegistry:
+    """Detectores por sesión con expulsión LRU."""
+
+    def __init__(self, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self._detectors: OrderedDict[str, QuestionDetector] = OrderedDict()
+
+    def get(self, session_id: str) -> QuestionDetector:
+        detector = self._detectors.pop(session_id, None) or QuestionDetector()
+        self._detectors[session_id] = detector
+        while len(self._detectors) > self.max_sessions:
+            self._detectors.popitem(last=False)
+        return detector
+
+    def drop(self, session_id: str) -> bool:
+        return self._detectors.pop(session_id, None) is not None
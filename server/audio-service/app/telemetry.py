@@ -0,0 +1,118 @@
+import time
+import uuid
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from fastapi import FastAPI, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Cabecera con la que el orquestador propaga el trace ID a cada servicio
+TRACE_HEADER = "X-Trace-Id"
+trace_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MAX_SPANS = 10000
+
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds", "Duración de cada etapa del pipeline",
+    ["service", "stage"], buckets=LATENCY_BUCKETS
+)
+STAGE_IN_FLIGHT = Gauge("stage_in_flight", "Etapas en ejecución", ["service", "stage"])
+STAGE_ERRORS = Counter("stage_errors_total", "Etapas que terminaron con excepción", ["service", "stage"])
+HTTP_SECONDS = Histogram(
+    "http_request_duration_seconds", "Duración de las peticiones HTTP",
+    ["service", "method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Peticiones HTTP en curso", ["service"])
+MODEL_LOAD_SECONDS = Gauge("model_load_seconds", "Tiempo de carga de cada modelo", ["service", "model"])
+CACHE_REQUESTS = Counter("cache_requests_total", "Consultas a cachés y filtros", ["service", "cache", "result"])
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_trace_id() -> Optional[str]:
+    return trace_id_var.get()
+
+
+class Telemetry:
+    """Métricas Prometheus y spans por trace ID de un servicio."""
+
+    def __init__(self, service: str):
+        self.service = service
+        self.spans: deque[dict[str, Any]] = deque(maxlen=MAX_SPANS)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mide una etapa; sirve tanto para código síncrono como alrededor de un await."""
+        in_flight = STAGE_IN_FLIGHT.labels(self.service, name)
+        in_flight.inc()
+        start_wall, start = time.time(), time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            STAGE_ERRORS.labels(self.service, name).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            STAGE_SECONDS.labels(self.service, name).observe(elapsed)
+            trace_id = trace_id_var.get()
+            if trace_id:
+                self.spans.append({
+                    "trace_id": trace_id,
+                    "service": self.service,
+                    "stage": name,
+                    "start": start_wall,
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "error": error
+                })
+
+    def model_loaded(self, model: str, seconds: float):
+        MODEL_LOAD_SECONDS.labels(self.service, model).set(seconds)
+        print(f"[startup] {model} cargado en {seconds:.1f}s")
+
+    def cache(self, cache: str, hit: bool):
+        CACHE_REQUESTS.labels(self.service, cache, "hit" if hit else "miss").inc()
+
+    def trace(self, trace_id: str) -> list[dict[str, Any]]:
+        return [s for s in self.spans if s["trace_id"] == trace_id]
+
+    def install(self, app: FastAPI, trace_endpoint: bool = True):
+        """Middleware de trazas + endpoints /metrics y /traces/{trace_id}."""
+
+        @app.middleware("http")
+        async def trace_requests(request: Request, call_next):
+            trace_id = request.headers.get(TRACE_HEADER) or new_trace_id()
+            token = trace_id_var.set(trace_id)
+            in_flight = HTTP_IN_FLIGHT.labels(self.service)
+            in_flight.inc()
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = await call_next(request)
+                status = response.status_code
+                response.headers[TRACE_HEADER] = trace_id
+                return response
+            finally:
+                in_flight.dec()
+                # Ruta plantilla (/meetings/{meeting_id}) para no disparar la cardinalidad
+                route = getattr(request.scope.get("route"), "path", "unmatched")
+                HTTP_SECONDS.labels(self.service, request.method, route, str(status)).observe(
+                    time.perf_counter() - start
+                )
+                trace_id_var.reset(token)
+
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics():
+            return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+        if trace_endpoint:
+            @app.get("/traces/{trace_id}", include_in_schema=False)
+            async def trace(trace_id: str):
+                return {"spans": self.trace(trace_id)}
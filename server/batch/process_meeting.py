@@ -0,0 +1,442 @@
+# server/batch/process_meeting.py
+"""
+Modo batch: procesa una reunión grabada (vídeo + audio) de punta a punta sin HTTP.
+
+    python batch/process_meeting.py grabacion.mp4 --out grabacion.meeting.json
+    python batch/process_meeting.py grabacion.mp4 --db orchestrator-service/meetings.db
+
+Pipeline en streaming:
+  ffmpeg (PCM 16 kHz) → VAD → Whisper ─┐
+                       └→ WAV → diarización ─┼→ preguntas → resumen (LLM) → registro
+  ffmpeg (1 frame/intervalo) → FrameGate → OCR + UI ─┘
+
+Cada servicio corre en su propio pool de procesos y carga sus modelos una sola
+vez (el mismo app.main que sirve HTTP), así que varias etapas avanzan en
+paralelo mientras ffmpeg sigue decodificando.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import wave
+import asyncio
+import argparse
+import importlib
+import threading
+import subprocess
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import numpy as np
+import webrtcvad
+
+SERVER = Path(__file__).resolve().parent.parent
+SERVICE_DIRS = {
+    "audio": SERVER / "audio-service",
+    "cv": SERVER / "cv-service",
+    "llm": SERVER / "llm-service",
+    "orchestrator": SERVER / "orchestrator-service",
+}
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_BYTES = SAMPLE_RATE * 2 * FRAME_MS // 1000
+PREROLL_FRAMES = 10
+
+# Módulo app.main del servicio cargado en este proceso worker
+_service = None
+
+
+# ——— Workers (se ejecutan en los pools de procesos) ————————————————————————
+def load_service(name: str):
+    """Inicializador de cada worker: importa app.main del servicio y sus modelos."""
+    global _service
+    path = str(SERVICE_DIRS[name])
+    # Todos los servicios se llaman `app`: solo debe quedar visible el de este worker
+    sys.path[:] = [p for p in sys.path if p not in {str(d) for d in SERVICE_DIRS.values()}]
+    sys.path.insert(0, path)
+    os.chdir(path)
+    _service = importlib.import_module("app.main")
+
+
+def transcribe_chunk(pcm: bytes, offset: float) -> list[dict]:
+    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    result = _service.run_whisper(audio)
+    return [{
+        "start": round(s["start"] + offset, 2),
+        "end": round(s["end"] + offset, 2),
+        "text": s["text"]
+    } for s in result["segments"] if s["text"]]
+
+
+def diarize(wav_path: str, num_speakers: int) -> list[dict]:
+    return _service.diarize_wav(wav_path, num_speakers)
+
+
+def find_questions(segments: list[dict]) -> list[dict]:
+    from app.questions import QuestionDetector, Segment
+    return QuestionDetector().feed(
+        [Segment(text=s["text"], start=s["start"], end=s["end"]) for s in segments],
+        final=True
+    )
+
+
+def analyze_frame(frame: np.ndarray, ts: float) -> dict:
+    result = _service.analyze_image(frame)
+    result["ts"] = ts
+    return result
+
+
+def summarize(transcript: str, highlights: list[str]) -> dict:
+    request = _service.SummarizeRequest(full_transcript=transcript, highlights=highlights)
+    response = asyncio.run(_service.summarize(request))
+    return {"summary": response.summary, "tasks": response.tasks}
+
+
+# ——— Etapas del proceso principal ——————————————————————————————————————
+class BoundedSubmitter:
+    """Envía trabajo a un pool con un máximo de tareas en vuelo.
+
+    Si OCR o Whisper van por detrás, el hilo lector de ffmpeg se bloquea en vez
+    de acumular frames/audio sin límite en memoria.
+    """
+
+    def __init__(self, executor: ProcessPoolExecutor, max_in_flight: int):
+        self.executor = executor
+        self.futures: list[Future] = []
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        self._slots.acquire()
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        self.futures.append(future)
+        return future
+
+    def results(self) -> list[Any]:
+        out = []
+        for future in self.futures:
+            try:
+                out.append(future.result())
+            except Exception as e:
+                print(f"[batch] Tarea fallida: {e}")
+        return out
+
+
+class Utterances:
+    """Agrupa frames de 30 ms con voz (webrtcvad) en fragmentos para Whisper."""
+
+    def __init__(self, aggressiveness: int, max_silence: float, max_seconds: float,
+                 min_speech: float):
+        self.vad = webrtcvad.Vad(aggressiveness)
+        self.max_silence_frames = int(max_silence * 1000 / FRAME_MS)
+        self.max_frames = int(max_seconds * 1000 / FRAME_MS)
+        self.min_speech_frames = int(min_speech * 1000 / FRAME_MS)
+        self._preroll: deque[bytes] = deque(maxlen=PREROLL_FRAMES)
+        self._chunk: list[bytes] = []
+        self._start = 0.0
+        self._speech = 0
+        self._silence = 0
+
+    def feed(self, frame: bytes, ts: float) -> Optional[tuple[float, bytes]]:
+        speech = self.vad.is_speech(frame, SAMPLE_RATE)
+        if not self._chunk:
+            if not speech:
+                self._preroll.append(frame)
+                return None
+            # Algo de pre-roll para no cortar la primera sílaba
+            self._start = ts - len(self._preroll) * FRAME_MS / 1000
+            self._chunk = list(self._preroll)
+            self._preroll.clear()
+        self._chunk.append(frame)
+        if speech:
+            self._speech += 1
+            self._silence = 0
+        else:
+            self._silence += 1
+        if self._silence >= self.max_silence_frames or len(self._chunk) >= self.max_frames:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[tuple[float, bytes]]:
+        chunk, start, speech = self._chunk, self._start, self._speech
+        self._chunk, self._speech, self._silence = [], 0, 0
+        if speech < self.min_speech_frames:
+            return None
+        return start, b"".join(chunk)
+
+
+def probe(src: str) -> dict:
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_streams", "-show_format", "-of", "json", src],
+        capture_output=True, check=True
+    ).stdout
+    info = json.loads(out)
+    video = next((s for s in info["streams"] if s.get("codec_type") == "video"), None)
+    audio = next((s for s in info["streams"] if s.get("codec_type") == "audio"), None)
+    return {
+        "duration": float(info.get("format", {}).get("duration") or 0),
+        "video": (int(video["width"]), int(video["height"])) if video else None,
+        "audio": audio is not None
+    }
+
+
+def extract_audio(src: str, wav_path: str, utterances: Utterances,
+                  on_chunk: Callable[[float, bytes], None]) -> float:
+    """Decodifica a PCM mono 16 kHz en streaming: VAD + WAV completo para la diarización."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", src,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "pipe:1"
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    frames = 0
+    with wave.open(wav_path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        while True:
+            frame = proc.stdout.read(FRAME_BYTES)
+            if len(frame) < FRAME_BYTES:
+                break
+            wav.writeframesraw(frame)
+            chunk = utterances.feed(frame, frames * FRAME_MS / 1000)
+            if chunk:
+                on_chunk(*chunk)
+            frames += 1
+    chunk = utterances.flush()
+    if chunk:
+        on_chunk(*chunk)
+    proc.wait()
+    return frames * FRAME_MS / 1000
+
+
+def extract_keyframes(src: str, size: tuple[int, int], interval: float, gate,
+                      on_frame: Callable[[np.ndarray, float], None]) -> int:
+    """Un frame cada `interval` s en BGR crudo; solo pasan los que el FrameGate acepta."""
+    width, height = size
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", src,
+        "-an", "-vf", f"fps=1/{interval}", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    frame_bytes = width * height * 3
+    seen = 0
+    while True:
+        buf = proc.stdout.read(frame_bytes)
+        if len(buf) < frame_bytes:
+            break
+        frame = np.frombuffer(buf, dtype=np.uint8).reshape(height, width, 3)
+        ts = seen * interval
+        if gate.should_process_frame(frame, now=ts):
+            on_frame(frame, ts)
+        seen += 1
+    proc.wait()
+    return seen
+
+
+def assign_speakers(segments: list[dict], turns: list[dict]):
+    """Asigna a cada segmento ASR el hablante con mayor solapamiento temporal."""
+    for seg in segments:
+        best, best_overlap = None, 0.0
+        for turn in turns:
+            overlap = min(seg["end"], turn["end"]) - max(seg["start"], turn["start"])
+            if overlap > best_overlap:
+                best, best_overlap = turn["speaker"], overlap
+        seg["speaker"] = best
+
+
+def slide_record(result: dict) -> dict:
+    return {
+        "ts": result["ts"],
+        "text": [t["text"] for t in result["text_detections"]],
+        "ui_elements": [u["class_name"] for u in result["ui_detections"]],
+        "text_detections": result["text_detections"],
+        "ui_detections": result["ui_detections"]
+    }
+
+
+def transcript_text(segments: list[dict]) -> str:
+    return "\n".join(
+        f"{s['speaker']}: {s['text']}" if s.get("speaker") else s["text"] for s in segments
+    )
+
+
+async def persist(record: dict, db_path: str, started_at: float):
+    """Vuelca el registro al MeetingStore del orquestador (historial y búsqueda)."""
+    from app.store import MeetingStore
+
+    store = MeetingStore(db_path)
+    await store.start()
+    meeting_id = record["meeting_id"]
+    store.open_meeting(meeting_id, record["title"], started_at=started_at)
+    events = [
+        ("transcript", s["text"], s.get("speaker"), {"start": s["start"], "end": s["end"]}, s["start"])
+        for s in record["transcript"]
+    ] + [
+        ("ocr", "\n".join(s["text"]), None, {"ui_elements": s["ui_elements"]}, s["ts"])
+        for s in record["slides"]
+    ] + [
+        ("question", q["text"], None, {"confidence": q["confidence"]}, q["end"])
+        for q in record["questions"]
+    ]
+    for i, (kind, text, speaker, data, offset) in enumerate(sorted(events, key=lambda e: e[4])):
+        store.append(meeting_id, kind, text, speaker=speaker, data=data, ts=started_at + offset)
+        if i % store.batch_size == 0:
+            await asyncio.sleep(0)  # deja al writer vaciar la cola
+    if record.get("summary"):
+        store.append(meeting_id, "summary", record["summary"], data={"tasks": record["tasks"]},
+                     ts=started_at + record["duration"])
+    store.close_meeting(meeting_id, ended_at=started_at + record["duration"])
+    await store.close()
+
+
+def process(args) -> dict:
+    from app.frame_gate import FrameGate
+
+    src = str(Path(args.input).resolve())
+    info = probe(src)
+    stage_seconds: dict[str, float] = {}
+    t0 = time.perf_counter()
+
+    ctx = multiprocessing.get_context("spawn")
+    audio_pool = ProcessPoolExecutor(args.audio_workers, ctx, load_service, ("audio",))
+    cv_pool = ProcessPoolExecutor(args.cv_workers, ctx, load_service, ("cv",))
+    llm_pool = ProcessPoolExecutor(1, ctx, load_service, ("llm",)) if not args.no_summary else None
+
+    asr = BoundedSubmitter(audio_pool, args.audio_workers * 2)
+    ocr = BoundedSubmitter(cv_pool, args.cv_workers * 2)
+    wav_path = str(Path(args.workdir) / f"{Path(src).stem}.{uuid.uuid4().hex[:8]}.wav")
+    counters = {"utterances": 0, "frames_seen": 0, "keyframes": 0, "audio_seconds": 0.0}
+
+    def run_audio():
+        utterances = Utterances(args.vad, args.max_silence, args.max_utterance, args.min_speech)
+
+        def on_chunk(offset: float, pcm: bytes):
+            counters["utterances"] += 1
+            asr.submit(transcribe_chunk, pcm, offset)
+
+        counters["audio_seconds"] = extract_audio(src, wav_path, utterances, on_chunk)
+        stage_seconds["audio_extract_vad"] = time.perf_counter() - t0
+
+    def run_video():
+        gate = FrameGate(args.ssim_threshold, args.cooldown, args.full_refresh)
+
+        def on_frame(frame: np.ndarray, ts: float):
+            counters["keyframes"] += 1
+            ocr.submit(analyze_frame, frame, ts)
+
+        counters["frames_seen"] = extract_keyframes(src, info["video"], args.frame_interval, gate, on_frame)
+        stage_seconds["keyframe_extract"] = time.perf_counter() - t0
+
+    readers = []
+    if info["audio"]:
+        readers.append(threading.Thread(target=run_audio, name="audio-reader"))
+    if info["video"] and not args.no_video:
+        readers.append(threading.Thread(target=run_video, name="video-reader"))
+    for t in readers:
+        t.start()
+    for t in readers:
+        t.join()
+
+    try:
+        diarization = None
+        if info["audio"] and args.speakers > 0:
+            # El WAV ya está completo: se diariza en cuanto quede libre un worker de audio
+            diarization = audio_pool.submit(diarize, wav_path, args.speakers)
+
+        segments = sorted((s for chunk in asr.results() for s in chunk), key=lambda s: s["start"])
+        stage_seconds["asr"] = time.perf_counter() - t0
+        turns = []
+        if diarization:
+            try:
+                turns = diarization.result()
+            except Exception as e:
+                print(f"[batch] Diarización fallida: {e}")
+        assign_speakers(segments, turns)
+        stage_seconds["diarize"] = time.perf_counter() - t0
+
+        questions = audio_pool.submit(find_questions, segments).result() if segments else []
+        slides = [slide_record(r) for r in sorted(ocr.results(), key=lambda r: r["ts"])]
+        stage_seconds["ocr_ui"] = time.perf_counter() - t0
+
+        summary = {"summary": "", "tasks": []}
+        if llm_pool and segments:
+            highlights = list(dict.fromkeys(s["text"][0] for s in slides if s["text"]))[:10]
+            try:
+                summary = llm_pool.submit(summarize, transcript_text(segments), highlights).result()
+            except Exception as e:
+                print(f"[batch] Resumen fallido: {e}")
+            stage_seconds["summarize"] = time.perf_counter() - t0
+    finally:
+        for pool in (audio_pool, cv_pool, llm_pool):
+            if pool:
+                pool.shutdown(cancel_futures=True)
+        if os.path.exists(wav_path):
+            os.unlink(wav_path)
+
+    return {
+        "meeting_id": uuid.uuid4().hex,
+        "title": args.title or Path(src).stem,
+        "source": src,
+        "duration": info["duration"] or counters["audio_seconds"],
+        "processed_at": time.time(),
+        "transcript": segments,
+        "questions": questions,
+        "slides": slides,
+        "summary": summary["summary"],
+        "tasks": summary["tasks"],
+        "stats": {
+            **counters,
+            # Segundos desde el arranque hasta que terminó cada etapa
+            "stages": {k: round(v, 2) for k, v in stage_seconds.items()},
+            "wall_seconds": round(time.perf_counter() - t0, 2)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="grabación de la reunión (cualquier formato que lea ffmpeg)")
+    parser.add_argument("--out", help="JSON de salida (por defecto <input>.meeting.json)")
+    parser.add_argument("--db", help="además, guardar en este MeetingStore (meetings.db del orquestador)")
+    parser.add_argument("--title", help="título de la reunión (por defecto el nombre del fichero)")
+    parser.add_argument("--audio-workers", type=int, default=1, help="procesos Whisper (cada uno carga el modelo)")
+    parser.add_argument("--cv-workers", type=int, default=2, help="procesos OCR + YOLO")
+    parser.add_argument("--speakers", type=int, default=2, help="nº de hablantes; 0 desactiva la diarización")
+    parser.add_argument("--no-video", action="store_true", help="ignorar la pista de vídeo")
+    parser.add_argument("--no-summary", action="store_true", help="no llamar al LLM")
+    parser.add_argument("--frame-interval", type=float, default=1.0, help="segundos entre frames muestreados")
+    parser.add_argument("--ssim-threshold", type=float, default=float(os.getenv("SSIM_THRESHOLD", "0.97")))
+    parser.add_argument("--cooldown", type=float, default=float(os.getenv("FRAME_COOLDOWN", "1.0")))
+    parser.add_argument("--full-refresh", type=float, default=float(os.getenv("FULL_REFRESH", "30.0")))
+    parser.add_argument("--vad", type=int, default=1, choices=range(4), help="agresividad de webrtcvad")
+    parser.add_argument("--max-silence", type=float, default=0.6, help="silencio que cierra un fragmento (s)")
+    parser.add_argument("--max-utterance", type=float, default=30.0, help="duración máxima de un fragmento (s)")
+    parser.add_argument("--min-speech", type=float, default=0.3, help="voz mínima para transcribir (s)")
+    parser.add_argument("--workdir", default=os.getenv("TMPDIR", "/tmp"), help="dónde dejar el WAV temporal")
+    args = parser.parse_args()
+
+    # El proceso principal solo necesita FrameGate y MeetingStore del orquestador
+    sys.path.insert(0, str(SERVICE_DIRS["orchestrator"]))
+
+    record = process(args)
+    out = Path(args.out or f"{args.input}.meeting.json")
+    out.write_text(json.dumps(record, ensure_ascii=False, indent=2), encoding="utf-8")
+    stats = record["stats"]
+    print(
+        f"[batch] {record['duration']:.0f}s de reunión en {stats['wall_seconds']:.0f}s: "
+        f"{len(record['transcript'])} segmentos, {len(record['questions'])} preguntas, "
+        f"{len(record['slides'])} diapositivas → {out}"
+    )
+    if args.db:
+        started_at = Path(args.input).stat().st_mtime - record["duration"]
+        asyncio.run(persist(record, args.db, started_at))
+        print(f"[batch] Reunión {record['meeting_id']} guardada en {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
 import io
 import json
+import time
 import base64
 from fastapi import FastAPI, File, UploadFile, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.responses import JSONResponse
@@ -10,30 +11,57 @@ import cv2
 import easyocr
 from ultralytics import YOLO
 
+from app.preprocess import Prepared, full_frame, prepare
+from app.profiling import Profiler
+from app.telemetry import Telemetry
+
 app = FastAPI(
     title="CV Microservice",
     description="Procesa frames para OCR y detección de elementos de UI.",
     version="0.1.0"
 )
+telemetry = Telemetry("cv-service")
+telemetry.install(app)
+profiler = Profiler("cv-service")
+profiler.install(app)
 
-# Carga de modelos
+# Carga de modelos (el tiempo de carga se expone en /metrics)
+t0 = time.perf_counter()
 reader = easyocr.Reader(['en', 'es'], gpu=False)
+telemetry.model_loaded("easyocr", time.perf_counter() - t0)
+t0 = time.perf_counter()
 yolo_model = YOLO('yolov8n.pt')
+telemetry.model_loaded("yolov8n", time.perf_counter() - t0)
+
+# Recorte de la zona con contenido y resolución por modelo (0 = frame completo)
+ROI_PREPROCESS = os.getenv("ROI_PREPROCESS", "1") != "0"
 
 # Función auxiliar para cargar imagen desde bytes
 def read_image_bytes(data: bytes) -> np.ndarray:
-    image = Image.open(io.BytesIO(data)).convert('RGB')
-    return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    with telemetry.stage("decode"):
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is not None:
+            return img
+        # Formatos que OpenCV no decodifica
+        image = Image.open(io.BytesIO(data)).convert('RGB')
+        return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+
+def preprocess(img: np.ndarray) -> Prepared:
+    if not ROI_PREPROCESS:
+        return full_frame(img)
+    with telemetry.stage("preprocess"):
+        return prepare(img)
 
 @app.post("/detect_text")
 async def detect_text(file: UploadFile = File(...)):
     """Detecta texto en la imagen usando EasyOCR."""
     try:
         content = await file.read()
-        img = read_image_bytes(content)
-        results = reader.readtext(img)
+        prep = preprocess(read_image_bytes(content))
+        with telemetry.stage("ocr"), profiler.inference("ocr"):
+            results = reader.readtext(prep.ocr.image)
         detections = [{
-            "bbox": [list(map(int, p)) for p in bbox],
+            "bbox": prep.ocr.quad(bbox),
             "text": text,
             "confidence": float(conf)
         } for bbox, text, conf in results]
@@ -47,18 +75,18 @@ async def detect_ui(file: UploadFile = File(...)):
     """Detecta elementos de UI en la imagen usando YOLO."""
     try:
         content = await file.read()
-        img = read_image_bytes(content)
-        results = yolo_model(img)
+        prep = preprocess(read_image_bytes(content))
+        with telemetry.stage("yolo"), profiler.inference("yolo"):
+            results = yolo_model(prep.ui.image)
         detections = []
         for r in results:
             for b in r.boxes:
                 cls = int(b.cls[0])
                 name = results.names.get(cls, str(cls))
-                x1, y1, x2, y2 = map(float, b.xyxy[0])
                 detections.append({
                     "class_id": cls,
                     "class_name": name,
-                    "bbox": [x1, y1, x2, y2],
+                    "bbox": prep.ui.box(list(map(float, b.xyxy[0]))),
                     "confidence": float(b.conf[0])
                 })
         return JSONResponse(content={"ui_detections": detections})
@@ -66,41 +94,48 @@ async def detect_ui(file: UploadFile = File(...)):
         print("detect_ui error:", e)
         return JSONResponse(content={"ui_detections": []})
 
-@app.post("/process_frame")
-async def process_frame(file: UploadFile = File(...)):
-    try:
-        content = await file.read()
-        img = read_image_bytes(content)
-        
-        # Mejorar parámetros de OCR
+def analyze_image(img: np.ndarray) -> dict:
+    """OCR + detección de UI de un frame ya decodificado (/process_frame y modo batch)"""
+    prep = preprocess(img)
+    # Mejorar parámetros de OCR
+    with telemetry.stage("ocr"), profiler.inference("ocr"):
         text_res = reader.readtext(
-            img,
+            prep.ocr.image,
             decoder = 'beamsearch',  # Aumentar precisión
             batch_size = 4,
             width_ths = 0.95,
             text_threshold = 0.7
         )
-        
-        # Filtrar detecciones de UI
-        ui_res = yolo_model(img, conf=0.6)  # Aumentar confianza mínima
-        ui_detections = []
-        class_names = ui_res[0].names if ui_res else {}
-        
-        for box in ui_res[0].boxes:
-            cls_id = int(box.cls[0])
-            confidence = float(box.conf[0])
-            element = {
-                "class_id": cls_id,
-                "class_name": class_names.get(cls_id, f"cls_{cls_id}"),
-                "confidence": confidence,
-                "bbox": [round(float(x), 2) for x in box.xyxy[0].tolist()]
-            }
-            ui_detections.append(element)
-        
-        return JSONResponse(content={
-            "text_detections": [{"text": t[1], "confidence": float(t[2])} for t in text_res],
-            "ui_detections": ui_detections
-        })
+    
+    # Filtrar detecciones de UI
+    with telemetry.stage("yolo"), profiler.inference("yolo"):
+        ui_res = yolo_model(prep.ui.image, conf=0.6)  # Aumentar confianza mínima
+    ui_detections = []
+    class_names = ui_res[0].names if ui_res else {}
+    
+    for box in ui_res[0].boxes:
+        cls_id = int(box.cls[0])
+        confidence = float(box.conf[0])
+        element = {
+            "class_id": cls_id,
+            "class_name": class_names.get(cls_id, f"cls_{cls_id}"),
+            "confidence": confidence,
+            "bbox": prep.ui.box(box.xyxy[0].tolist())
+        }
+        ui_detections.append(element)
+    
+    return {
+        "text_detections": [{"text": t[1], "confidence": float(t[2])} for t in text_res],
+        "ui_detections": ui_detections,
+        "roi": prep.info()
+    }
+
+@app.post("/process_frame")
+async def process_frame(file: UploadFile = File(...)):
+    try:
+        content = await file.read()
+        img = read_image_bytes(content)
+        return JSONResponse(content=analyze_image(img))
         
     except Exception as e:
         print(f"Error en process_frame: {str(e)}")
@@ -120,12 +155,14 @@ async def cv_ws(ws: WebSocket):
             if not img_b64:
                 continue
             img_bytes = base64.b64decode(img_b64.split(",")[-1])
-            img = read_image_bytes(img_bytes)
+            prep = preprocess(read_image_bytes(img_bytes))
             # OCR parcial
-            text_res = reader.readtext(img)
+            with telemetry.stage("ocr"), profiler.inference("ocr"):
+                text_res = reader.readtext(prep.ocr.image)
             texts = [t for _, t, _ in text_res]
             # UI parcial
-            ui_res = yolo_model(img)
+            with telemetry.stage("yolo"), profiler.inference("yolo"):
+                ui_res = yolo_model(prep.ui.image)
             classes = [int(b.cls[0]) for r in ui_res for b in r.boxes]
             await ws.send_json({"text": texts, "ui": classes})
     except WebSocketDisconnect:
@@ -0,0 +1,160 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# Resolución a la que se analiza el layout (no la que ven los modelos)
+ANALYSIS_WIDTH = 1280
+# Diferencia de gris respecto al fondo / gradiente morfológico que cuenta como contenido
+BACKGROUND_TOLERANCE = 12
+GRADIENT_THRESHOLD = 30
+# Fracción mínima de píxeles con contenido para que una fila/columna no sea borde
+MIN_CONTENT_FRACTION = 0.002
+ROI_MARGIN = 0.02
+MIN_ROI_SIDE = 32
+
+# Altura de línea con la que EasyOCR (CRAFT) sigue leyendo bien
+OCR_TARGET_TEXT_PX = float(os.getenv("OCR_TARGET_TEXT_PX", "24"))
+# Nunca reducir más que esto para OCR: el texto pequeño que el análisis no ve sigue legible
+OCR_MIN_SCALE = float(os.getenv("OCR_MIN_SCALE", "0.5"))
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2560"))
+# YOLO redimensiona a imgsz de todos modos; reducir aquí ahorra copia y letterbox
+YOLO_IMGSZ = int(os.getenv("YOLO_IMGSZ", "640"))
+
+
+@dataclass
+class View:
+    """Imagen que recibe un modelo y cómo volver a coordenadas del frame original."""
+    image: np.ndarray
+    x: int
+    y: int
+    scale: float
+
+    def point(self, px: float, py: float) -> tuple[float, float]:
+        return px / self.scale + self.x, py / self.scale + self.y
+
+    def box(self, xyxy) -> list[float]:
+        x1, y1 = self.point(xyxy[0], xyxy[1])
+        x2, y2 = self.point(xyxy[2], xyxy[3])
+        return [round(x1, 2), round(y1, 2), round(x2, 2), round(y2, 2)]
+
+    def quad(self, points) -> list[list[int]]:
+        return [[int(round(c)) for c in self.point(*p)] for p in points]
+
+
+@dataclass
+class Prepared:
+    region: tuple[int, int, int, int]   # x1, y1, x2, y2 en el frame original
+    text_height: Optional[float]        # altura típica de línea, px originales
+    source_pixels: int
+    ocr: View
+    ui: View
+
+    def info(self) -> dict:
+        ocr_h, ocr_w = self.ocr.image.shape[:2]
+        return {
+            "bbox": list(self.region),
+            "text_height": round(self.text_height, 1) if self.text_height else None,
+            "ocr_scale": round(self.ocr.scale, 3),
+            "ui_scale": round(self.ui.scale, 3),
+            "ocr_pixels_ratio": round(ocr_h * ocr_w / self.source_pixels, 3)
+        }
+
+
+def edge_mask(gray: np.ndarray) -> np.ndarray:
+    """Píxeles con gradiente morfológico alto: trazos de texto y contornos."""
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    return (cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, kernel) > GRADIENT_THRESHOLD).astype(np.uint8)
+
+
+def content_mask(gray: np.ndarray, edges: Optional[np.ndarray] = None) -> np.ndarray:
+    """Píxeles que difieren del fondo (mediana del marco exterior) o tienen bordes."""
+    frame = np.concatenate([gray[0], gray[-1], gray[:, 0], gray[:, -1]])
+    background = np.uint8(np.median(frame))
+    differs = cv2.absdiff(gray, np.full_like(gray, background)) > BACKGROUND_TOLERANCE
+    edges = edge_mask(gray) if edges is None else edges
+    return (differs | edges.astype(bool)).astype(np.uint8)
+
+
+def content_bounds(mask: np.ndarray) -> Optional[tuple[int, int, int, int]]:
+    rows = np.flatnonzero(mask.mean(axis=1) > MIN_CONTENT_FRACTION)
+    cols = np.flatnonzero(mask.mean(axis=0) > MIN_CONTENT_FRACTION)
+    if not rows.size or not cols.size:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def estimate_text_height(mask: np.ndarray) -> Optional[float]:
+    """Altura de línea (px de `mask`, una máscara de bordes): une caracteres en horizontal y mide componentes alargadas.
+
+    Se usa el percentil 20 y no la mediana para que los títulos no escondan el texto de cuerpo.
+    """
+    closed = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+    _, _, stats, _ = cv2.connectedComponentsWithStats(closed, connectivity=8)
+    max_h = 0.2 * mask.shape[0]
+    # El gradiente morfológico ensancha cada trazo ~1 px por lado
+    heights = [h - 2 for _, _, w, h, _ in stats[1:] if w >= 2 * h and 3 <= h <= max_h]
+    if len(heights) < 3:
+        return None
+    return float(np.percentile(heights, 20))
+
+
+def resize(img: np.ndarray, scale: float) -> np.ndarray:
+    if scale >= 1.0:
+        return img
+    return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def prepare(img: np.ndarray) -> Prepared:
+    """Recorta bordes/fondo liso y elige la resolución de inferencia de cada modelo."""
+    h, w = img.shape[:2]
+    f = min(1.0, ANALYSIS_WIDTH / w)
+    gray = resize(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), f)
+    edges = edge_mask(gray)
+    mask = content_mask(gray, edges)
+
+    bounds = content_bounds(mask)
+    if bounds is None:
+        x1, y1, x2, y2 = 0, 0, w, h
+    else:
+        mx, my = int(ROI_MARGIN * w), int(ROI_MARGIN * h)
+        x1 = max(0, int(bounds[0] / f) - mx)
+        y1 = max(0, int(bounds[1] / f) - my)
+        x2 = min(w, int(np.ceil(bounds[2] / f)) + mx)
+        y2 = min(h, int(np.ceil(bounds[3] / f)) + my)
+        if x2 - x1 < MIN_ROI_SIDE or y2 - y1 < MIN_ROI_SIDE:
+            x1, y1, x2, y2 = 0, 0, w, h
+
+    text_height = None
+    if bounds is not None:
+        # Solo bordes: en una diapositiva con fondo propio dentro de un letterbox la máscara
+        # de contenido es un único bloque. Se deja fuera el contorno de la propia ROI.
+        bx1, by1, bx2, by2 = bounds
+        inner = edges[by1 + 2:by2 - 2, bx1 + 2:bx2 - 2]
+        small_height = estimate_text_height(inner) if inner.size else None
+        text_height = small_height / f if small_height else None
+
+    crop = img[y1:y2, x1:x2]
+    longest = max(x2 - x1, y2 - y1)
+
+    ocr_scale = min(1.0, OCR_MAX_SIDE / longest)
+    if text_height:
+        ocr_scale = min(ocr_scale, max(OCR_MIN_SCALE, OCR_TARGET_TEXT_PX / text_height))
+    ui_scale = min(1.0, YOLO_IMGSZ / longest)
+
+    return Prepared(
+        region=(x1, y1, x2, y2),
+        text_height=text_height,
+        source_pixels=h * w,
+        ocr=View(resize(crop, ocr_scale), x1, y1, ocr_scale),
+        ui=View(resize(crop, ui_scale), x1, y1, ui_scale)
+    )
+
+
+def full_frame(img: np.ndarray) -> Prepared:
+    """Sin preprocesado (ROI_PREPROCESS=0): ambos modelos ven el frame original."""
+    h, w = img.shape[:2]
+    view = View(img, 0, 0, 1.0)
+    return Prepared(region=(0, 0, w, h), text_height=None, source_pixels=h * w, ocr=view, ui=view)
@@ -1,14 +1,18 @@
 # app/main.py
 import os
 import httpx
+from collections import OrderedDict
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from openai import AsyncOpenAI
-from typing import AsyncGenerator, List, Literal, Union
+from typing import AsyncGenerator, List, Literal, Optional, Union
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Request
+
+from app.profiling import Profiler
+from app.telemetry import Telemetry
 load_dotenv()
 
 AI_API_KEY = os.getenv("AI_ML_API_KEY")
@@ -27,6 +31,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+telemetry = Telemetry("llm-service")
+telemetry.install(app)
+Profiler("llm-service").install(app)
 
 # Cliente OpenAI asíncrono
 client = AsyncOpenAI(
@@ -40,11 +47,18 @@ client = AsyncOpenAI(
     }
 )
 
+# Contextos de diapositiva recibidos del orquestador, por referencia (LRU)
+SLIDE_CONTEXT_CACHE_SIZE = int(os.getenv("SLIDE_CONTEXT_CACHE_SIZE", "4096"))
+slide_contexts: OrderedDict[str, str] = OrderedDict()
+
 # ——— Schemas ————————————————————————————————————————————————————————————
 class GenerateRequest(BaseModel):
     text:         List[str] = []
     ui:           List[str] = []
     audio_meta:   Union[str, None] = None
+    # Contexto condensado de la diapositiva; con slide_ref basta enviarlo la primera vez
+    context:      Union[str, None] = None
+    slide_ref:    Union[str, None] = None
 
 class GenerateResponse(BaseModel):
     answer: str
@@ -79,23 +93,26 @@ async def handle_ai_request(
     try:
         if stream:
             async def generate_stream():
-                async with client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=messages,
-                    stream=True,
-                    temperature=0.7,
-                    max_tokens=500
-                ) as s:
-                    async for chunk in s:
-                        if content := chunk.choices[0].delta.content:
-                            yield f"data: {content}\n\n"
+                # La etapa cubre el stream completo, hasta el último token
+                with telemetry.stage("upstream_llm_stream"):
+                    async with client.chat.completions.create(
+                        model="gpt-3.5-turbo",
+                        messages=messages,
+                        stream=True,
+                        temperature=0.7,
+                        max_tokens=500
+                    ) as s:
+                        async for chunk in s:
+                            if content := chunk.choices[0].delta.content:
+                                yield f"data: {content}\n\n"
             return generate_stream()
 
-        resp = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            temperature=0.5
-        )
+        with telemetry.stage("upstream_llm"):
+            resp = await client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=messages,
+                temperature=0.5
+            )
         return resp.choices[0].message.content
 
     except httpx.ConnectError as e:
@@ -103,6 +120,24 @@ async def handle_ai_request(
     except Exception as e:
         raise HTTPException(500, f"Error interno del servidor: {e}")
 
+def resolve_slide_context(request: GenerateRequest) -> Optional[str]:
+    """Guarda el contexto que llega con slide_ref o recupera el de una referencia ya vista."""
+    if not request.slide_ref:
+        return request.context
+    if request.context is not None:
+        slide_contexts[request.slide_ref] = request.context
+        slide_contexts.move_to_end(request.slide_ref)
+        while len(slide_contexts) > SLIDE_CONTEXT_CACHE_SIZE:
+            slide_contexts.popitem(last=False)
+        return request.context
+    context = slide_contexts.get(request.slide_ref)
+    telemetry.cache("slide_context", hit=context is not None)
+    if context is None:
+        # El orquestador reintenta enviando el contexto
+        raise HTTPException(409, f"slide_ref desconocido: {request.slide_ref}")
+    slide_contexts.move_to_end(request.slide_ref)
+    return context
+
 # ——— Endpoints —————————————————————————————————————————————————————————————
 
 @app.post("/generate_answer", response_model=GenerateResponse)
@@ -114,7 +149,14 @@ async def generate_answer(request: GenerateRequest):
         "ui": [...],
         "audio_meta": "..."
       }
+    o, con el contexto de una diapositiva ya condensado:
+      {
+        "audio_meta": "...",
+        "context": "...",      # opcional si slide_ref ya se envió antes
+        "slide_ref": "..."
+      }
     """
+    context = resolve_slide_context(request)
     # Construye tu prompt de sistema
     system_prompt = (
         "Eres un asistente multimodal experto en análisis de contexto visual y auditivo. "
@@ -126,9 +168,19 @@ async def generate_answer(request: GenerateRequest):
     )
 
     # Construye el prompt de usuario usando los campos que recibiste
+    if context is not None:
+        # slide_ref = "<meeting_id>/<slide_id>.<revisión>"
+        slide = request.slide_ref.rsplit("/", 1)[-1].split(".")[0] if request.slide_ref else "actual"
+        screen = f"Diapositiva {slide}:\n{context}\n"
+        if request.text or request.ui:
+            screen += f"Texto adicional: {', '.join(request.text + request.ui)}\n"
+    else:
+        screen = (
+            f"Texto en pantalla: {', '.join(request.text) or 'Ninguno'}\n"
+            f"Elementos UI: {', '.join(request.ui)   or 'Ninguno'}\n"
+        )
     user_prompt = (
-        f"Texto en pantalla: {', '.join(request.text) or 'Ninguno'}\n"
-        f"Elementos UI: {', '.join(request.ui)   or 'Ninguno'}\n"
+        f"{screen}"
         f"Metadato de audio: {request.audio_meta or 'Ninguno'}\n\n"
         "Genera una respuesta integrada considerando estos tres contextos."
     )
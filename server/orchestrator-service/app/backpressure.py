@@ -0,0 +1,114 @@
+import time
+import asyncio
+from collections import deque
+from typing import Any, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LatestQueue(Generic[T]):
+    """Cola acotada "latest wins": al llenarse descarta el elemento más antiguo."""
+
+    def __init__(self, maxsize: int = 1):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items: deque[tuple[float, T]] = deque()
+        self._ready = asyncio.Event()
+
+    def put(self, item: T):
+        if len(self._items) >= self.maxsize:
+            self._items.popleft()
+            self.dropped += 1
+        self._items.append((time.monotonic(), item))
+        self._ready.set()
+
+    async def get(self) -> tuple[float, T]:
+        """Devuelve (instante de encolado, elemento)."""
+        while not self._items:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._items.popleft()
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def oldest_age(self) -> float:
+        return time.monotonic() - self._items[0][0] if self._items else 0.0
+
+
+class CoalescingQueue:
+    """Acumula chunks de bytes y los entrega todos juntos en el siguiente get().
+
+    Solo si lo pendiente supera `max_bytes` se descartan los chunks más antiguos,
+    para que la memoria siga acotada aunque el consumidor se quede atrás.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.coalesced = 0
+        self.dropped = 0
+        self._chunks: deque[bytes] = deque()
+        self._bytes = 0
+        self._first_enqueued: Optional[float] = None
+        self._ready = asyncio.Event()
+
+    def put(self, chunk: bytes):
+        if self._first_enqueued is None:
+            self._first_enqueued = time.monotonic()
+        self._chunks.append(chunk)
+        self._bytes += len(chunk)
+        while self._bytes > self.max_bytes and len(self._chunks) > 1:
+            self._bytes -= len(self._chunks.popleft())
+            self.dropped += 1
+        self._ready.set()
+
+    async def get(self) -> tuple[float, list[bytes]]:
+        """Devuelve (instante del chunk pendiente más antiguo, chunks acumulados)."""
+        while not self._chunks:
+            self._ready.clear()
+            await self._ready.wait()
+        chunks = list(self._chunks)
+        enqueued = self._first_enqueued or time.monotonic()
+        self.coalesced += len(chunks) - 1
+        self._chunks.clear()
+        self._bytes = 0
+        self._first_enqueued = None
+        return enqueued, chunks
+
+    def qsize(self) -> int:
+        return len(self._chunks)
+
+    def pending_bytes(self) -> int:
+        return self._bytes
+
+    def oldest_age(self) -> float:
+        return time.monotonic() - self._first_enqueued if self._first_enqueued else 0.0
+
+
+class StageStats:
+    """Contadores de una etapa del pipeline para exponer el retraso por sesión."""
+
+    def __init__(self):
+        self.processed = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._busy_since: Optional[float] = None
+
+    def begin(self):
+        self._busy_since = time.monotonic()
+
+    def end(self, enqueued_at: float):
+        latency = time.monotonic() - enqueued_at
+        self.processed += 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self._busy_since = None
+
+    def snapshot(self) -> dict[str, Any]:
+        busy = time.monotonic() - self._busy_since if self._busy_since else 0.0
+        return {
+            "processed": self.processed,
+            "last_latency_s": round(self.last_latency, 3),
+            "max_latency_s": round(self.max_latency, 3),
+            "in_flight_s": round(busy, 3)
+        }
@@ -0,0 +1,109 @@
+import importlib.util
+from collections import OrderedDict
+from typing import Any, Optional
+
+import httpx
+
+from app.telemetry import TRACE_HEADER, Telemetry, current_trace_id
+
+# HTTP/2 solo si el paquete h2 está instalado (httpx[http2]); si no, keep-alive HTTP/1.1
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=30.0
+)
+# Referencias de diapositiva cuyo contexto ya se envió a llm-service (su caché es mayor)
+SLIDE_REFS_TRACKED = 1024
+
+
+class ServiceClients:
+    """Pools httpx compartidos y de larga vida hacia los servicios CV, Audio y LLM."""
+
+    def __init__(self, cv_url: str, audio_url: str, ai_url: str, telemetry: Telemetry,
+                 timeout: float = 30.0):
+        self.urls = {"cv": cv_url, "audio": audio_url, "ai": ai_url}
+        self.telemetry = telemetry
+        self.timeout = httpx.Timeout(timeout, connect=5.0)
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._slide_refs: OrderedDict[str, None] = OrderedDict()
+
+    async def start(self):
+        for name, url in self.urls.items():
+            self._clients[name] = httpx.AsyncClient(
+                base_url=url,
+                http2=HTTP2_ENABLED,
+                limits=POOL_LIMITS,
+                timeout=self.timeout,
+                event_hooks={"request": [self._inject_trace]}
+            )
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    @staticmethod
+    async def _inject_trace(request: httpx.Request):
+        trace_id = current_trace_id()
+        if trace_id:
+            request.headers[TRACE_HEADER] = trace_id
+
+    async def get_json(self, service: str, path: str) -> Any:
+        response = await self._clients[service].get(path)
+        response.raise_for_status()
+        return response.json()
+
+    async def _post(self, service: str, path: str, **kwargs) -> Any:
+        with self.telemetry.stage(f"{service}{path}"):
+            response = await self._clients[service].post(path, **kwargs)
+            response.raise_for_status()
+            return response.json()
+
+    # ——— CV ——————————————————————————————————————————————————————————————
+    async def process_frame(self, image: bytes) -> dict:
+        files = {"file": ("frame.jpg", image, "image/jpeg")}
+        return await self._post("cv", "/process_frame", files=files)
+
+    # ——— Audio ———————————————————————————————————————————————————————————
+    async def transcribe(self, audio: bytes, session_id: Optional[str] = None) -> dict:
+        """Devuelve transcript, segmentos con tiempos y duración del audio.
+
+        Con session_id, audio-service retiene el audio en el ring de la sesión.
+        """
+        files = {"file": ("chunk.webm", audio, "audio/webm")}
+        params = {"session_id": session_id} if session_id else None
+        return await self._post("audio", "/transcribe", files=files, params=params)
+
+    async def detect_questions_stream(self, session_id: str, segments: list[dict],
+                                      final: bool = False, now: Optional[float] = None) -> dict:
+        """Envía solo los segmentos nuevos al detector incremental de la sesión."""
+        payload = {"session_id": session_id, "segments": segments, "final": final, "now": now}
+        return await self._post("audio", "/detect_questions/stream", json=payload)
+
+    async def release_session(self, session_id: str):
+        """Libera en audio-service el detector de preguntas y el audio retenido de la sesión."""
+        response = await self._clients["audio"].delete(f"/sessions/{session_id}")
+        response.raise_for_status()
+
+    # ——— LLM —————————————————————————————————————————————————————————————
+    async def generate_answer(self, question: str, context: Optional[str] = None,
+                              slide_ref: Optional[str] = None) -> str:
+        """Pregunta sobre una diapositiva; su contexto solo viaja la primera vez que llm-service ve `slide_ref`."""
+        payload = {"audio_meta": question, "slide_ref": slide_ref}
+        if not slide_ref or slide_ref not in self._slide_refs:
+            payload["context"] = context
+        try:
+            data = await self._post("ai", "/generate_answer", json=payload)
+        except httpx.HTTPStatusError as e:
+            # llm-service reiniciado u otra réplica: no conoce la referencia
+            if e.response.status_code != 409 or "context" in payload:
+                raise
+            data = await self._post("ai", "/generate_answer", json={**payload, "context": context})
+        if slide_ref:
+            self._slide_refs[slide_ref] = None
+            self._slide_refs.move_to_end(slide_ref)
+            while len(self._slide_refs) > SLIDE_REFS_TRACKED:
+                self._slide_refs.popitem(last=False)
+        return data.get("answer", "")
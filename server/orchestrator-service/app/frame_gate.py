@@ -0,0 +1,87 @@
+import time
+import base64
+import hashlib
+from typing import Any, Optional
+
+import cv2
+import numpy as np
+from skimage.metrics import structural_similarity
+
+THUMB_SIZE = (160, 90)
+
+
+class FrameGate:
+    """Filtra frames casi idénticos al último procesado (SSIM sobre miniatura en gris).
+
+    En directo el reloj es time.monotonic(); el modo batch pasa `now` con el
+    timestamp del frame dentro de la grabación.
+    """
+
+    def __init__(self, ssim_threshold: float, cooldown: float, full_refresh: float):
+        self.ssim_threshold = ssim_threshold
+        self.cooldown = cooldown
+        self.full_refresh = full_refresh
+        self._last_thumb: Optional[np.ndarray] = None
+        self._last_time = float("-inf")
+        self._exported: Optional[tuple[np.ndarray, dict[str, Any]]] = None
+
+    @staticmethod
+    def thumbnail(image: bytes) -> Optional[np.ndarray]:
+        buf = np.frombuffer(image, dtype=np.uint8)
+        img = cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            return None
+        return cv2.resize(img, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def thumbnail_array(frame: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+    def should_process(self, image: bytes, now: Optional[float] = None) -> bool:
+        thumb = self.thumbnail(image)
+        if thumb is None:
+            return False
+        return self.accept(thumb, now)
+
+    def should_process_frame(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """Igual que should_process pero con un frame BGR ya decodificado."""
+        return self.accept(self.thumbnail_array(frame), now)
+
+    def accept(self, thumb: np.ndarray, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._last_time
+
+        if self._last_thumb is not None and elapsed < self.full_refresh:
+            score = structural_similarity(self._last_thumb, thumb)
+            if score >= self.ssim_threshold or elapsed < self.cooldown:
+                return False
+
+        self._last_thumb = thumb
+        self._last_time = now
+        return True
+
+    def export_state(self) -> Optional[dict[str, Any]]:
+        """Miniatura (PNG) y antigüedad del último frame aceptado, para retomar la sesión en otro worker."""
+        thumb = self._last_thumb
+        if thumb is None:
+            return None
+        if self._exported is None or self._exported[0] is not thumb:
+            ok, png = cv2.imencode(".png", thumb)
+            self._exported = (thumb, {
+                "hash": hashlib.sha1(thumb.tobytes()).hexdigest(),
+                "thumb": base64.b64encode(png.tobytes()).decode("ascii") if ok else None
+            })
+        return {**self._exported[1], "age_s": time.monotonic() - self._last_time, "saved_at": time.time()}
+
+    def restore_state(self, state: Optional[dict[str, Any]]):
+        if not state or not state.get("thumb"):
+            return
+        png = np.frombuffer(base64.b64decode(state["thumb"]), dtype=np.uint8)
+        thumb = cv2.imdecode(png, cv2.IMREAD_GRAYSCALE)
+        if thumb is None:
+            return
+        self._last_thumb = thumb
+        # Relojes monotónicos distintos entre procesos: se reconstruye la antigüedad
+        age = float(state.get("age_s", 0.0)) + max(0.0, time.time() - state.get("saved_at", time.time()))
+        self._last_time = time.monotonic() - age
@@ -1,41 +1,58 @@
 import os
+import time
 import asyncio
+from typing import Optional
 from dotenv import load_dotenv
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from openai import AsyncOpenAI
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+
+from app.clients import ServiceClients
+from app.frame_gate import FrameGate
+from app.pipeline import MeetingSession
+from app.sharding import ShardRouter
+from app.slides import SlideRegistry
+from app.state import make_state_backend
+from app.store import MeetingStore
+from app.profiling import Profiler
+from app.telemetry import Telemetry
 
 # Cargar variables de entorno
 load_dotenv()
-AI_API_KEY = os.getenv("AI_ML_API_KEY")
-AI_API_URL = os.getenv("AI_ML_API_URL")
-
-if not AI_API_KEY or not AI_API_URL:
-    raise RuntimeError("Faltan variables de entorno AI_ML_API_KEY o AI_ML_API_URL")
+CV_SERVICE_URL = os.getenv("CV_SERVICE_URL", "http://localhost:8000")
+AUDIO_SERVICE_URL = os.getenv("AUDIO_SERVICE_URL", "http://localhost:8002")
+AI_SERVICE_URL = os.getenv("AI_SERVICE_URL", "http://localhost:8001")
+SSIM_THRESHOLD = float(os.getenv("SSIM_THRESHOLD", "0.9"))
+FRAME_COOLDOWN = float(os.getenv("FRAME_COOLDOWN", "20"))
+FULL_REFRESH = float(os.getenv("FULL_REFRESH", "120"))
+MAX_PENDING_AUDIO_BYTES = int(os.getenv("MAX_PENDING_AUDIO_BYTES", str(2 * 1024 * 1024)))
+SPECULATIVE_ANSWERS = os.getenv("SPECULATIVE_ANSWERS", "true").lower() == "true"
+SPECULATION_MATCH = float(os.getenv("SPECULATION_MATCH", "0.8"))
+# Diapositivas analizadas que se recuerdan por sesión y distancia de Hamming para reconocerlas
+SLIDE_CACHE_SIZE = int(os.getenv("SLIDE_CACHE_SIZE", "32"))
+SLIDE_HASH_DISTANCE = int(os.getenv("SLIDE_HASH_DISTANCE", "8"))
+MEETING_DB_PATH = os.getenv("MEETING_DB_PATH", "meetings.db")
+# Sharding: URL pública (ws://) de este worker, la de todos los workers y el backend de estado
+WORKER_URL = os.getenv("ORCHESTRATOR_WORKER_URL", f"ws://localhost:{os.getenv('PORT', '8003')}")
+WORKERS = [w.strip() for w in os.getenv("ORCHESTRATOR_WORKERS", "").split(",") if w.strip()]
+SESSION_STATE_URL = os.getenv("SESSION_STATE_URL", "memory://")
+SESSION_STATE_TTL = float(os.getenv("SESSION_STATE_TTL", "3600"))
+# Código de cierre con el que se indica al cliente que se reconecte a otro worker
+REDIRECT_CLOSE_CODE = 4307
+# Cada cuánto se revisan las reuniones suspendidas que nadie ha retomado
+REAP_INTERVAL = 60.0
 
-# Inicializar cliente OpenAI
-client = AsyncOpenAI(
-    api_key=AI_API_KEY,
-    base_url=AI_API_URL,
-    timeout=30.0
-)
-
-# Documento simulado en pantalla
-DOCUMENT_LINES = [
-    "2.5 Professional Development",
-    "Professional development is intended to ensure that users, from beginner to the career security professional, possess a required level of knowledge and competence necessary for their roles.",
-    "Professional development validates skills through certification. Such development and successful certification can be termed “professionalization.”",
-    "The preparatory work to testing for such a certification normally includes study of a prescribed body of knowledge or technical curriculum, and may be supplemented by on-the-job experience.",
-    "The movement toward professionalization within the IT security field can be seen among IT security officers, IT security auditors, IT contractors, and system/network administrators, and is evolving.",
-    "There are two types of certification: general and technical. The general certification focuses on establishing a foundation of knowledge on the many aspects of the IT security profession.",
-    "The technical certification focuses primarily on the technical security issues related to specific platforms, operating systems, vendor products, etc.",
-    "Some agencies and organizations focus on IT security professionals with certifications as part of their recruitment efforts.",
-    "Other organizations offer pay raises and bonuses to retain users with certifications and encourage others in the IT security field to seek certification."
-]
-DOCUMENT_TEXT = "\n".join(DOCUMENT_LINES)
-
-# Estado para evitar respuestas múltiples en prueba
-sent_audio = False
+telemetry = Telemetry("orchestrator-service")
+# Pools HTTP compartidos por todas las sesiones
+services = ServiceClients(CV_SERVICE_URL, AUDIO_SERVICE_URL, AI_SERVICE_URL, telemetry)
+# Historial persistente de reuniones
+store = MeetingStore(MEETING_DB_PATH)
+# Estado de sesión compartido entre workers y reparto de reuniones
+state = make_state_backend(SESSION_STATE_URL, SESSION_STATE_TTL)
+router = ShardRouter(WORKER_URL, WORKERS, state)
+# Sesiones activas en este proceso
+sessions: dict[str, MeetingSession] = {}
+reaper_task: Optional[asyncio.Task] = None
 
 app = FastAPI()
 app.add_middleware(
@@ -44,46 +61,244 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+telemetry.install(app, trace_endpoint=False)
+Profiler("orchestrator-service").install(app)
+
+
+class SessionCollector:
+    """Profundidad y antigüedad de las colas de todas las sesiones, leídas al hacer scrape."""
+
+    def collect(self):
+        active = GaugeMetricFamily("orchestrator_sessions", "Sesiones WebSocket activas", value=len(sessions))
+        depth = GaugeMetricFamily("orchestrator_queue_depth", "Elementos en cola por etapa", labels=["stage"])
+        age = GaugeMetricFamily(
+            "orchestrator_queue_max_age_seconds", "Antigüedad del elemento pendiente más viejo", labels=["stage"]
+        )
+        pending_bytes = GaugeMetricFamily("orchestrator_audio_pending_bytes", "Bytes de audio pendientes")
+        queues = {
+            "frame": [s.frames for s in sessions.values()],
+            "audio": [s.audio for s in sessions.values()]
+        }
+        for stage, qs in queues.items():
+            depth.add_metric([stage], sum(q.qsize() for q in qs))
+            age.add_metric([stage], max((q.oldest_age() for q in qs), default=0.0))
+        pending_bytes.add_metric([], sum(q.pending_bytes() for q in queues["audio"]))
+        yield from (active, depth, age, pending_bytes)
+
+
+REGISTRY.register(SessionCollector())
+
+@app.on_event("startup")
+async def startup_event():
+    global reaper_task
+    await services.start()
+    await store.start()
+    await router.start()
+    reaper_task = asyncio.create_task(reap_suspended())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Las sesiones abiertas se suspenden (no se terminan) para que otro worker las retome
+    await asyncio.gather(*(s.close(ended=False) for s in list(sessions.values())))
+    if reaper_task:
+        reaper_task.cancel()
+        await asyncio.gather(reaper_task, return_exceptions=True)
+    await router.close()
+    await state.close()
+    await services.close()
+    await store.close()
+
+async def load_state(meeting_id: str) -> Optional[dict]:
+    try:
+        return await state.load(meeting_id)
+    except Exception as e:
+        print(f"[state] No se pudo leer la sesión {meeting_id}: {e}")
+        return None
+
+async def reap_suspended():
+    """Termina las reuniones suspendidas cuyo estado caducó sin que nadie las retomara.
+
+    Las marcas de suspensión están en el backend de estado, así que cualquier
+    worker recoge también las de workers reiniciados o caídos. Libera el
+    detector y el audio retenido en audio-service y cierra la reunión en el
+    historial con la hora de la suspensión.
+    """
+    while True:
+        await asyncio.sleep(REAP_INTERVAL)
+        try:
+            expired = await state.suspended_before(time.time() - SESSION_STATE_TTL)
+        except Exception as e:
+            print(f"[state] No se pudieron leer las sesiones suspendidas: {e}")
+            continue
+        for meeting_id, suspended_at in expired:
+            try:
+                if meeting_id in sessions:
+                    await state.unmark_suspended(meeting_id)
+                    continue
+                if not await state.claim_suspended(meeting_id):
+                    continue  # otro worker ya la recogió
+            except Exception as e:
+                print(f"[state] No se pudo recoger la sesión {meeting_id}: {e}")
+                continue
+            store.close_meeting(meeting_id, ended_at=suspended_at)
+            try:
+                await services.release_session(meeting_id)
+            except Exception as e:
+                print(f"[audio] No se pudo liberar la sesión caducada {meeting_id}: {e}")
+
+@app.get("/sessions")
+async def list_sessions():
+    """Retraso y profundidad de colas de cada sesión activa."""
+    return {"sessions": [s.lag() for s in sessions.values()]}
+
+@app.get("/route/{meeting_id}")
+async def route_meeting(meeting_id: str):
+    """Worker dueño de una reunión (para balanceadores o clientes que conectan directamente)."""
+    saved = await load_state(meeting_id)
+    owner = await router.owner(meeting_id, (saved or {}).get("owner"))
+    return {
+        "meeting_id": meeting_id,
+        "owner": owner,
+        "ws_url": router.ws_url(owner, meeting_id),
+        "local": owner == router.self_url
+    }
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Spans de un trace en el orquestador y en los servicios a los que llamó, por orden de inicio."""
+    async def remote(service: str) -> list[dict]:
+        try:
+            return (await services.get_json(service, f"/traces/{trace_id}")).get("spans", [])
+        except Exception as e:
+            print(f"[trace] {service} no respondió: {e}")
+            return []
+
+    spans = telemetry.trace(trace_id)
+    for found in await asyncio.gather(*(remote(name) for name in ("cv", "audio", "ai"))):
+        spans.extend(found)
+    return {"trace_id": trace_id, "spans": sorted(spans, key=lambda s: s["start"])}
+
+@app.get("/meetings")
+async def list_meetings(
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[float] = Query(None, description="started_at del último elemento de la página anterior"),
+    before_id: Optional[str] = Query(None, description="id del último elemento de la página anterior")
+):
+    meetings = await store.list_meetings(limit=limit, before=before, before_id=before_id)
+    last = meetings[-1] if len(meetings) == limit else None
+    next_cursor = {"before": last["started_at"], "before_id": last["id"]} if last else None
+    return {"meetings": meetings, "next": next_cursor}
+
+@app.get("/meetings/{meeting_id}")
+async def get_meeting(meeting_id: str):
+    meeting = await store.get_meeting(meeting_id)
+    if meeting is None:
+        raise HTTPException(404, "Reunión no encontrada")
+    return meeting
+
+@app.get("/meetings/{meeting_id}/events")
+async def meeting_events(
+    meeting_id: str,
+    kind: Optional[str] = None,
+    speaker: Optional[str] = Query(None, description="Solo reuniones con hablantes (modo batch con --db)"),
+    after: int = Query(0, ge=0, description="id del último evento de la página anterior"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    events = await store.events(meeting_id, kind=kind, speaker=speaker, after_id=after, limit=limit)
+    next_cursor = events[-1]["id"] if len(events) == limit else None
+    return {"events": events, "next": next_cursor}
+
+@app.get("/search")
+async def search(q: str, meeting_id: Optional[str] = None, limit: int = Query(20, ge=1, le=100)):
+    """Búsqueda de texto completo en transcripts y texto de diapositivas."""
+    return {"results": await store.search(q, meeting_id=meeting_id, limit=limit)}
+
 @app.websocket("/ws/orchestrator")
-async def ws_orchestrator(ws: WebSocket):
+async def ws_orchestrator(ws: WebSocket, meeting_id: Optional[str] = None):
     await ws.accept()
-    try:
-        sent_audio = False  # Para evitar enviar múltiples veces la misma respuesta
+    if meeting_id:
+        # La misma reunión abierta en una conexión anterior: la nueva la sustituye
+        previous = sessions.pop(meeting_id, None)
+        if previous:
+            await previous.close(ended=False)
+            try:
+                await previous.ws.close(code=REDIRECT_CLOSE_CODE)
+            except Exception:
+                pass
+        saved = await load_state(meeting_id)
+        owner = await router.owner(meeting_id, (saved or {}).get("owner"))
+        if owner != router.self_url:
+            await ws.send_json({
+                "type": "redirect",
+                "data": {"meeting_id": meeting_id, "url": router.ws_url(owner, meeting_id)}
+            })
+            await ws.close(code=REDIRECT_CLOSE_CODE)
+            return
+    else:
+        meeting_id, saved = await router.new_meeting_id(), None
 
+    session = MeetingSession(
+        ws, services,
+        FrameGate(SSIM_THRESHOLD, FRAME_COOLDOWN, FULL_REFRESH),
+        max_audio_bytes=MAX_PENDING_AUDIO_BYTES,
+        speculative=SPECULATIVE_ANSWERS,
+        speculation_match=SPECULATION_MATCH,
+        store=store,
+        meeting_id=meeting_id,
+        state=state,
+        owner=router.self_url,
+        # Una diapositiva cacheada se vuelve a analizar con la misma cadencia que el refresco del FrameGate
+        slides=SlideRegistry(SLIDE_CACHE_SIZE, SLIDE_HASH_DISTANCE, max_age=FULL_REFRESH)
+    )
+    if saved:
+        session.restore(saved)
+    sessions[session.id] = session
+    try:
+        await state.unmark_suspended(session.id)
+    except Exception as e:
+        print(f"[state] No se pudo desmarcar la sesión {session.id}: {e}")
+    session.start()
+    await session.save_state()
+    await session.send({"type": "session", "data": {
+        "meeting_id": session.id,
+        "worker": router.self_url,
+        "resumed": session.resumed,
+        "transcript_tail": session.transcript_tail,
+        "slide_id": session.slides.current.id if session.slides.current else None
+    }})
+    ended = False
+    try:
         while True:
             msg = await ws.receive_json()
             msg_type = msg.get("type")
 
+            # Solo se encola: los workers de cada etapa aplican la política de backpressure
             if msg_type == "frame":
-                # Simula análisis de imagen
-                await ws.send_json({
-                    "type": "frame_processed",
-                    "data": {
-                        "text": ["2.5 Professional Development", "Certification", "Security", "IT", "Training"],
-                        "ui_elements": ["Header", "Paragraph"]
-                    }
-                })
+                session.push_frame(msg.get("data", ""))
+
+            elif msg_type == "audio":
+                session.push_audio(msg.get("data", ""))
+
+            elif msg_type == "question":
+                # Pregunta escrita por el usuario: se responde con el contexto cacheado de la diapositiva
+                question = msg.get("data") or {}
+                session.ask(question.get("text", ""), question.get("slide_id"))
+
+            elif msg_type == "summary":
+                # El cliente pide el resumen a llm-service al terminar; aquí solo se persiste
+                summary = msg.get("data") or {}
+                session.record("summary", summary.get("summary", ""), data={"tasks": summary.get("tasks", [])})
+
+            elif msg_type == "lag":
+                await session.send({"type": "lag", "data": session.lag()})
 
-            elif msg_type == "audio" and not sent_audio:
-                question = "What is this section about?"
-                await ws.send_json({"type": "transcript", "data": question})
-                await ws.send_json({"type": "questions", "data": [question]})
-
-                messages = [
-                    {"role": "system", "content": "You are an assistant helping summarize and explain technical documents."},
-                    {"role": "user", "content": f"Document:\n{DOCUMENT_TEXT}\n\nQuestion: {question}"}
-                ]
-                response = await client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=messages,
-                    temperature=0.5
-                )
-                answer = response.choices[0].message.content.strip()
-                await ws.send_json({"type": "answer", "data": answer})
-                sent_audio = True  # Previene envíos repetidos
+            elif msg_type == "end":
+                # Fin explícito de la reunión: se descarta su estado compartido
+                ended = True
+                break
 
             else:
-                await ws.send_json({
+                await session.send({
                     "type": "error",
                     "message": f"Unsupported message type: {msg_type}"
                 })
@@ -93,3 +308,8 @@ async def ws_orchestrator(ws: WebSocket):
     except Exception as e:
         print("Critical error:", str(e))
         await ws.close(code=1011)
+    finally:
+        if sessions.get(session.id) is session:
+            sessions.pop(session.id)
+        # Sin "end" la desconexión se trata como suspensión: el cliente puede reconectar y retomarla
+        await session.close(ended=ended)
@@ -0,0 +1,456 @@
+import time
+import uuid
+import asyncio
+import base64
+from typing import Any, Optional
+
+from fastapi import WebSocket
+
+from app.backpressure import CoalescingQueue, LatestQueue, StageStats
+from app.clients import ServiceClients
+from app.frame_gate import FrameGate
+from app.slides import Slide, SlideRegistry, frame_hash
+from app.store import MeetingStore
+from app.telemetry import current_trace_id, new_trace_id, trace_id_var
+from app.speculation import Speculation, SpeculationStats, normalize, similarity
+
+# Marcadores EBML de un stream WebM (MediaRecorder solo envía la cabecera en el primer blob)
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+CLUSTER_ID = b"\x1f\x43\xb6\x75"
+
+# Confianza mínima de la frase abierta para empezar a responder antes de confirmarla
+SPECULATION_MIN_CONFIDENCE = 0.5
+# ~8 min de opus a 32 kbps antes de empezar a descartar audio pendiente
+MAX_PENDING_AUDIO_BYTES = 2 * 1024 * 1024
+# Estado compartido: cada cuánto se vuelca como mucho y cuánto transcript se conserva
+STATE_SAVE_INTERVAL = 1.0
+TRANSCRIPT_TAIL_CHARS = 2000
+STATE_VERSION = 2
+
+
+def decode_b64(data: str) -> bytes:
+    """Decodifica base64 plano o data URL (data:...;base64,XXXX)."""
+    return base64.b64decode(data.split(",")[-1])
+
+
+class MeetingSession:
+    """Pipeline por sesión WebSocket: frames → CV, audio → ASR → preguntas → LLM.
+
+    Cada etapa tiene su propia cola acotada y un único worker, de modo que una
+    etapa lenta no acumula trabajo: los frames siguen la política "latest wins",
+    el audio pendiente se concatena y una pregunta nueva cancela la respuesta
+    que aún esté en curso.
+
+    En modo especulativo la generación arranca en cuanto el transcript parcial
+    parece una pregunta, y se conserva o cancela cuando la pregunta se confirma.
+
+    Cada diapositiva analizada queda en un registro por hash del frame: volver
+    a ella no pasa otra vez por cv-service, y preguntas y prompts la citan por
+    id con su contexto condensado.
+
+    Con un backend de estado, lo necesario para retomar la reunión (miniatura
+    del último frame, diapositivas, cola del transcript, offset de audio) se
+    vuelca periódicamente, y otro worker puede continuarla.
+    """
+
+    def __init__(self, ws: WebSocket, services: ServiceClients, gate: FrameGate,
+                 max_audio_bytes: int = MAX_PENDING_AUDIO_BYTES,
+                 speculative: bool = True, speculation_match: float = 0.8,
+                 store: Optional[MeetingStore] = None, meeting_id: Optional[str] = None,
+                 state=None, owner: Optional[str] = None, slides: Optional[SlideRegistry] = None):
+        self.id = meeting_id or uuid.uuid4().hex
+        self.ws = ws
+        self.services = services
+        self.store = store
+        self.state = state
+        self.owner = owner
+        self.gate = gate
+        self.slides = slides or SlideRegistry()
+        self.audio_offset = 0.0
+        self.transcript_tail = ""
+        self.answered: set[str] = set()
+        # El detector tiene una frase abierta: un lote en silencio puede cerrarla
+        self._question_pending = False
+        self.resumed = False
+        self._dirty = False
+        self._closed = False
+        # La fila de la reunión se crea con el primer evento: conectar sin más no deja reuniones vacías
+        self._meeting_opened = False
+        self.frames: LatestQueue[bytes] = LatestQueue(maxsize=1)
+        self.audio = CoalescingQueue(max_bytes=max_audio_bytes)
+        self.stats = {name: StageStats() for name in ("frame", "audio", "answer")}
+        self.frames_skipped = 0
+        self.answers_cancelled = 0
+        self._webm_header: Optional[bytes] = None
+        self.speculative = speculative
+        self.speculation_match = speculation_match
+        self.speculation_stats = SpeculationStats()
+        self._speculation: Optional[Speculation] = None
+        self._answer_task: Optional[asyncio.Task] = None
+        self._send_lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def send(self, payload: dict[str, Any]):
+        async with self._send_lock:
+            await self.ws.send_json(payload)
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def record(self, kind: str, text: str = "", **kwargs):
+        """Registra un evento de la reunión en el almacén (escritura por lotes, no bloquea)."""
+        if self.store:
+            if not self._meeting_opened:
+                self.store.open_meeting(self.id)
+                self._meeting_opened = True
+            self.store.append(self.id, kind, text, **kwargs)
+
+    def start(self):
+        self.spawn(self._frame_worker())
+        self.spawn(self._audio_worker())
+        if self.state:
+            self.spawn(self._state_worker())
+
+    async def close(self, ended: bool = True):
+        """Cierra la sesión; con ended=False solo se suspende y su estado queda para retomarla."""
+        if self._closed:
+            return
+        self._closed = True
+        self._discard_speculation()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if not ended and self.state:
+            # Suspendida: sigue abierta en el historial hasta que termine o caduque su estado.
+            # La marca vive en el backend para que cualquier worker pueda recogerla.
+            await self.save_state()
+            try:
+                await self.state.mark_suspended(self.id, time.time())
+            except Exception as e:
+                print(f"[state] No se pudo marcar la sesión {self.id} como suspendida: {e}")
+            return
+        if self.store:
+            self.store.close_meeting(self.id)
+        try:
+            if self.state:
+                await self.state.delete(self.id)
+            await self.services.release_session(self.id)
+        except Exception as e:
+            print(f"[audio] No se pudo liberar el estado de la sesión: {e}")
+
+    # ——— Estado compartido ———————————————————————————————————————————————
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "v": STATE_VERSION,
+            "meeting_id": self.id,
+            "owner": self.owner,
+            "updated_at": time.time(),
+            "frame": self.gate.export_state(),
+            "slides": self.slides.export(),
+            # Cursor de la línea de tiempo: el detector de audio-service sigue indexado por meeting_id
+            "audio_offset": self.audio_offset,
+            "transcript_tail": self.transcript_tail,
+            "answered": sorted(self.answered),
+            "webm_header": base64.b64encode(self._webm_header).decode("ascii") if self._webm_header else None
+        }
+
+    def restore(self, state: dict[str, Any]):
+        if state.get("v") != STATE_VERSION:
+            return
+        self.gate.restore_state(state.get("frame"))
+        self.slides.restore(state.get("slides"))
+        self.audio_offset = float(state.get("audio_offset", 0.0))
+        self.transcript_tail = state.get("transcript_tail", "")
+        self.answered = set(state.get("answered", []))
+        self._question_pending = True
+        # El MediaRecorder del cliente sigue el mismo stream: sin la cabecera no se puede decodificar
+        if state.get("webm_header"):
+            self._webm_header = base64.b64decode(state["webm_header"])
+        self.resumed = True
+
+    def _mark_dirty(self):
+        self._dirty = True
+
+    async def save_state(self):
+        self._dirty = False
+        try:
+            await self.state.save(self.id, self.snapshot())
+        except Exception as e:
+            self._dirty = True
+            print(f"[state] No se pudo guardar la sesión {self.id}: {e}")
+
+    async def _state_worker(self):
+        while True:
+            await asyncio.sleep(STATE_SAVE_INTERVAL)
+            if self._dirty:
+                await self.save_state()
+
+    def lag(self) -> dict[str, Any]:
+        """Retraso y profundidad de cola por etapa."""
+        return {
+            "session_id": self.id,
+            "frame": {
+                **self.stats["frame"].snapshot(),
+                "queued": self.frames.qsize(),
+                "queued_age_s": round(self.frames.oldest_age(), 3),
+                "dropped": self.frames.dropped,
+                "skipped_unchanged": self.frames_skipped
+            },
+            "audio": {
+                **self.stats["audio"].snapshot(),
+                "queued": self.audio.qsize(),
+                "queued_bytes": self.audio.pending_bytes(),
+                "queued_age_s": round(self.audio.oldest_age(), 3),
+                "coalesced": self.audio.coalesced,
+                "dropped": self.audio.dropped
+            },
+            "answer": {
+                **self.stats["answer"].snapshot(),
+                "cancelled": self.answers_cancelled
+            },
+            "speculation": self.speculation_stats.snapshot(),
+            "slides": self.slides.stats()
+        }
+
+    # ——— Frames ——————————————————————————————————————————————————————————
+    @staticmethod
+    def _decode_payload(data: str, kind: str) -> bytes:
+        """Payload base64 del cliente; vacío o corrupto se descarta (b"")."""
+        try:
+            return decode_b64(data) if data else b""
+        except ValueError as e:
+            print(f"[{kind}] Payload base64 inválido: {e}")
+            return b""
+
+    def push_frame(self, data: str):
+        image = self._decode_payload(data, "frame")
+        if image:
+            self.frames.put(image)
+
+    async def _frame_worker(self):
+        while True:
+            enqueued_at, image = await self.frames.get()
+            trace_id_var.set(new_trace_id())
+            # Un frame defectuoso no puede parar el worker: la sesión seguiría sin procesar frames
+            try:
+                with self.services.telemetry.stage("frame_gate"):
+                    thumb = self.gate.thumbnail(image)
+                    changed = thumb is not None and self.gate.accept(thumb)
+                self.services.telemetry.cache("frame_gate", hit=not changed)
+                if not changed:
+                    self.frames_skipped += 1
+                    continue
+                self.stats["frame"].begin()
+                try:
+                    await self._process_frame(image, frame_hash(thumb))
+                finally:
+                    self.stats["frame"].end(enqueued_at)
+            except Exception as e:
+                print(f"[frame] Error procesando frame de la sesión {self.id}: {e!r}")
+
+    async def _process_frame(self, image: bytes, key: int):
+        slide = self.slides.lookup(key)
+        self.services.telemetry.cache("slide", hit=slide is not None)
+        cached = slide is not None
+        if slide is None:
+            try:
+                result = await self.services.process_frame(image)
+            except Exception as e:
+                print(f"[frame] Error en cv-service: {e}")
+                return
+            slide = self.slides.add(
+                key,
+                [d["text"] for d in result.get("text_detections", [])],
+                [d["class_name"] for d in result.get("ui_detections", [])]
+            )
+            self.record("ocr", "\n".join(slide.text), data={"slide_id": slide.id, "ui_elements": slide.ui})
+        self._mark_dirty()
+        await self.send({
+            "type": "frame_processed",
+            "data": {"slide_id": slide.id, "text": slide.text, "ui_elements": slide.ui, "cached": cached}
+        })
+
+    # ——— Audio ———————————————————————————————————————————————————————————
+    def push_audio(self, data: str):
+        chunk = self._decode_payload(data, "audio")
+        if not chunk:
+            return
+        if chunk.startswith(EBML_MAGIC):
+            idx = chunk.find(CLUSTER_ID)
+            if idx > 0:
+                self._webm_header = chunk[:idx]
+                self._mark_dirty()
+        self.audio.put(chunk)
+
+    def _with_webm_header(self, audio: bytes) -> bytes:
+        """Antepone la cabecera WebM del primer blob si el lote no la trae."""
+        if audio.startswith(EBML_MAGIC) or not self._webm_header:
+            return audio
+        return self._webm_header + audio
+
+    async def _audio_worker(self):
+        while True:
+            # Todo el audio que llegó mientras se transcribía se procesa en un solo lote
+            enqueued_at, chunks = await self.audio.get()
+            # Un trace por lote: las respuestas que salgan de él heredan el contexto
+            trace_id_var.set(new_trace_id())
+            self.stats["audio"].begin()
+            try:
+                await self._process_audio(self._with_webm_header(b"".join(chunks)))
+            except Exception as e:
+                print(f"[audio] Error procesando lote de la sesión {self.id}: {e!r}")
+            finally:
+                self.stats["audio"].end(enqueued_at)
+
+    async def _process_audio(self, audio: bytes):
+        try:
+            result = await self.services.transcribe(audio, session_id=self.id)
+        except Exception as e:
+            print(f"[audio] Error en audio-service: {e}")
+            return
+        # Los tiempos de cada lote son relativos: se desplazan a la línea de tiempo de la sesión
+        offset = self.audio_offset
+        self.audio_offset += float(result.get("duration") or 0.0)
+        self._mark_dirty()
+        transcript = result.get("transcript", "")
+        segments: list[dict] = []
+        if transcript:
+            self.transcript_tail = f"{self.transcript_tail} {transcript}".strip()[-TRANSCRIPT_TAIL_CHARS:]
+            await self.send({"type": "transcript", "data": transcript})
+            segments = [{
+                "text": s["text"],
+                "start": offset + s["start"],
+                "end": offset + s["end"]
+            } for s in result.get("segments") or [{"text": transcript, "start": 0.0, "end": 0.0}]]
+            self.record("transcript", transcript, data={"segments": segments})
+        elif not self._question_pending:
+            return
+        try:
+            # El fin del lote hace avanzar el reloj del detector aunque no haya texto:
+            # una pregunta sin puntuación seguida de silencio se cierra aquí
+            detected = await self.services.detect_questions_stream(self.id, segments, now=self.audio_offset)
+        except Exception as e:
+            print(f"[audio] Error detectando preguntas: {e}")
+            return
+        self._question_pending = bool(detected.get("pending"))
+
+        new_questions = [
+            q["text"] for q in detected.get("questions", [])
+            if normalize(q["text"]) not in self.answered
+        ]
+        if new_questions:
+            # Solo se responde la pregunta más reciente; la respuesta anterior queda obsoleta.
+            # Las anteriores del mismo lote quedan en el historial pero no se anuncian al cliente.
+            question = new_questions[-1]
+            self.answered.add(normalize(question))
+            self._mark_dirty()
+            slide_id = self.slides.current.id if self.slides.current else None
+            for q in new_questions[:-1]:
+                self.record("question", q, data={"slide_id": slide_id, "superseded": True})
+            self.record("question", question, data={"slide_id": slide_id})
+            await self.send({"type": "questions", "data": [question], "slide_id": slide_id})
+            self.replace_answer(question, self._claim_speculation(question))
+
+        pending = detected.get("pending")
+        if self.speculative and pending and pending["confidence"] >= SPECULATION_MIN_CONFIDENCE:
+            self._maybe_speculate(pending["text"])
+
+    # ——— Especulación ————————————————————————————————————————————————————
+    def _maybe_speculate(self, partial: str):
+        """Arranca la respuesta sobre la frase abierta que el detector ya ve como pregunta."""
+        if normalize(partial) in self.answered:
+            return
+        spec = self._speculation
+        if spec and similarity(spec.text, partial) >= self.speculation_match:
+            return
+        self._discard_speculation()
+        slide = self.slides.current
+        task = self.spawn(self._generate(partial, slide))
+        self._speculation = Speculation(partial, f"{slide.context if slide else ''} {partial}", task,
+                                        slide_id=slide.id if slide else None)
+        self.speculation_stats.started += 1
+
+    def _claim_speculation(self, question: str) -> Optional[Speculation]:
+        """Devuelve la especulación si coincide con la pregunta confirmada; si no, la cancela."""
+        spec = self._speculation
+        if spec is None:
+            return None
+        if similarity(spec.text, question) >= self.speculation_match:
+            self._speculation = None
+            self.speculation_stats.hit(spec)
+            self.services.telemetry.cache("speculation", hit=True)
+            return spec
+        self._discard_speculation()
+        return None
+
+    def _discard_speculation(self):
+        spec, self._speculation = self._speculation, None
+        if spec is None:
+            return
+        self.speculation_stats.miss(spec)
+        self.services.telemetry.cache("speculation", hit=False)
+        spec.task.cancel()
+        # Si ya había fallado (p. ej. error de llm-service) nadie la espera: se recoge aquí
+        spec.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    # ——— LLM —————————————————————————————————————————————————————————————
+    def ask(self, question: str, slide_id: Optional[str] = None):
+        """Pregunta enviada por el cliente, opcionalmente sobre una diapositiva anterior."""
+        question = question.strip()
+        if not question:
+            return
+        self.answered.add(normalize(question))
+        self._mark_dirty()
+        slide = self.slides.get(slide_id) or self.slides.current
+        self.record("question", question, data={"slide_id": slide.id if slide else None, "manual": True})
+        self.replace_answer(question, slide=slide)
+
+    def replace_answer(self, question: str, speculation: Optional[Speculation] = None,
+                       slide: Optional[Slide] = None):
+        if self._answer_task and not self._answer_task.done():
+            self._answer_task.cancel()
+            self.answers_cancelled += 1
+        if speculation:
+            slide = self.slides.get(speculation.slide_id)
+        self._answer_task = self.spawn(self.answer_question(question, speculation, slide or self.slides.current))
+
+    def _generate(self, question: str, slide: Optional[Slide]):
+        if slide is None:
+            return self.services.generate_answer(question)
+        # La referencia cambia con cada revisión: llm-service nunca usa un contexto desactualizado
+        ref = f"{self.id}/{slide.id}.{slide.revision}"
+        return self.services.generate_answer(question, context=slide.context, slide_ref=ref)
+
+    async def answer_question(self, question: str, speculation: Optional[Speculation] = None,
+                              slide: Optional[Slide] = None):
+        enqueued_at = speculation.started_at if speculation else time.monotonic()
+        slide_id = slide.id if slide else None
+        self.stats["answer"].begin()
+        try:
+            if speculation:
+                answer = await speculation.task
+            else:
+                answer = await self._generate(question, slide)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[llm] Error generando respuesta: {e}")
+            return
+        finally:
+            self.stats["answer"].end(enqueued_at)
+        answer = answer.strip()
+        self.record("answer", answer, data={
+            "question": question,
+            "slide_id": slide_id,
+            "speculative": speculation is not None
+        })
+        await self.send({
+            "type": "answer",
+            "data": answer,
+            "question": question,
+            "slide_id": slide_id,
+            "trace_id": current_trace_id()
+        })
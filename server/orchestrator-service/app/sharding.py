@@ -0,0 +1,83 @@
+import time
+import uuid
+import asyncio
+import hashlib
+from typing import Optional
+
+HEARTBEAT_INTERVAL = 5.0
+HEARTBEAT_TTL = 15.0
+
+
+def rendezvous_owner(key: str, workers: list[str]) -> str:
+    """Hashing de rendezvous (HRW): cada clave va al worker con mayor peso.
+
+    Al añadir o quitar un worker solo cambian de dueño sus ~1/N sesiones.
+    """
+    return max(workers, key=lambda w: hashlib.sha1(f"{w}|{key}".encode()).digest())
+
+
+class ShardRouter:
+    """Decide qué worker es dueño de cada reunión.
+
+    La lista de workers es estática (ORCHESTRATOR_WORKERS); si el backend de
+    estado publica latidos, solo cuentan los vivos, así que las sesiones de un
+    worker caído pasan al siguiente por HRW y continúan desde el estado guardado.
+    """
+
+    def __init__(self, self_url: str, workers: list[str], state):
+        self.self_url = self_url
+        self.workers = sorted(set(workers) | {self_url})
+        self.state = state
+        self._live: list[str] = list(self.workers)
+        self._live_checked = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self._beat()
+        self._task = asyncio.create_task(self._heartbeat_loop())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _beat(self):
+        try:
+            await self.state.heartbeat(self.self_url, HEARTBEAT_TTL)
+        except Exception as e:
+            print(f"[shard] No se pudo publicar el latido: {e}")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            await self._beat()
+
+    async def live_workers(self) -> list[str]:
+        if time.monotonic() - self._live_checked < HEARTBEAT_INTERVAL:
+            return self._live
+        try:
+            alive = await self.state.live_workers()
+        except Exception as e:
+            print(f"[shard] No se pudo leer la lista de workers vivos: {e}")
+            alive = None
+        live = [w for w in self.workers if alive is None or w in alive or w == self.self_url]
+        self._live, self._live_checked = live, time.monotonic()
+        return live
+
+    async def owner(self, meeting_id: str, current: Optional[str] = None) -> str:
+        """Dueño de la reunión; `current` (el dueño guardado en el estado) se respeta mientras viva."""
+        live = await self.live_workers()
+        if current in live:
+            return current
+        return rendezvous_owner(meeting_id, live)
+
+    async def new_meeting_id(self) -> str:
+        """Id nuevo cuyo dueño por HRW es este worker (evita redirigir sesiones nuevas)."""
+        live = await self.live_workers()
+        while True:
+            meeting_id = uuid.uuid4().hex
+            if rendezvous_owner(meeting_id, live) == self.self_url:
+                return meeting_id
+
+    def ws_url(self, worker: str, meeting_id: str) -> str:
+        return f"{worker.rstrip('/')}/ws/orchestrator?meeting_id={meeting_id}"
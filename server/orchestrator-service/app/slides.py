@@ -0,0 +1,135 @@
+import time
+from collections import Counter, OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+import cv2
+import numpy as np
+
+# dHash de HASH_GRID × HASH_GRID bits sobre la miniatura en gris del FrameGate
+HASH_GRID = 16
+# Longitud máxima del texto de pantalla en el contexto condensado que va al LLM
+CONTEXT_MAX_CHARS = 1500
+
+
+def frame_hash(thumb: np.ndarray) -> int:
+    """Hash perceptual de la miniatura: estable ante recompresión JPEG y ruido del vídeo."""
+    small = cv2.resize(thumb, (HASH_GRID + 1, HASH_GRID), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def condense(text: list[str], ui: list[str], max_chars: int = CONTEXT_MAX_CHARS) -> str:
+    """Contexto de una diapositiva para el prompt: líneas OCR sin repetir y recuento de elementos UI."""
+    lines = "\n".join(dict.fromkeys(t.strip() for t in text if t.strip()))
+    if len(lines) > max_chars:
+        lines = lines[:max_chars].rsplit("\n", 1)[0]
+    counts = Counter(ui).most_common()
+    elements = ", ".join(f"{name} ×{n}" if n > 1 else name for name, n in counts)
+    return f"Texto en pantalla:\n{lines or 'Ninguno'}\nElementos UI: {elements or 'Ninguno'}"
+
+
+@dataclass
+class Slide:
+    id: str
+    hash: int
+    text: list[str]
+    ui: list[str]
+    context: str
+    revision: int = 0
+    updated_at: float = 0.0     # time.time(): sobrevive al paso de la sesión a otro worker
+    hits: int = 0
+
+    def export(self) -> dict[str, Any]:
+        return {**asdict(self), "hash": f"{self.hash:x}"}
+
+    @classmethod
+    def load(cls, data: dict[str, Any]) -> "Slide":
+        return cls(**{**data, "hash": int(data["hash"], 16)})
+
+
+class SlideRegistry:
+    """Diapositivas ya analizadas de una sesión, indexadas por hash del frame.
+
+    Volver a una diapositiva conocida reutiliza su OCR, sus detecciones UI y su
+    contexto condensado sin pasar otra vez por cv-service. Una entrada más
+    antigua que `max_age` se vuelve a analizar (mismo id, nueva revisión), igual
+    que el refresco periódico del FrameGate.
+    """
+
+    def __init__(self, max_slides: int = 32, max_distance: int = 8, max_age: float = 120.0):
+        self.max_slides = max_slides
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.current: Optional[Slide] = None
+        self.hits = 0
+        self.misses = 0
+        self._slides: OrderedDict[str, Slide] = OrderedDict()
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self._slides)
+
+    def get(self, slide_id: Optional[str]) -> Optional[Slide]:
+        return self._slides.get(slide_id) if slide_id else None
+
+    def _nearest(self, key: int) -> Optional[Slide]:
+        best, best_distance = None, self.max_distance + 1
+        for slide in self._slides.values():
+            distance = (slide.hash ^ key).bit_count()
+            if distance < best_distance:
+                best, best_distance = slide, distance
+        return best
+
+    def lookup(self, key: int) -> Optional[Slide]:
+        """Diapositiva vigente cuyo hash está a distancia de Hamming <= max_distance."""
+        slide = self._nearest(key)
+        if slide is None or time.time() - slide.updated_at > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        slide.hits += 1
+        self._slides.move_to_end(slide.id)
+        self.current = slide
+        return slide
+
+    def add(self, key: int, text: list[str], ui: list[str]) -> Slide:
+        slide = self._nearest(key)
+        if slide is None:
+            slide = Slide(f"s{self._next_id}", key, [], [], "")
+            self._next_id += 1
+        else:
+            slide.revision += 1
+        slide.hash, slide.text, slide.ui = key, text, ui
+        slide.context = condense(text, ui)
+        slide.updated_at = time.time()
+        self._slides[slide.id] = slide
+        self._slides.move_to_end(slide.id)
+        while len(self._slides) > self.max_slides:
+            self._slides.popitem(last=False)
+        self.current = slide
+        return slide
+
+    def stats(self) -> dict[str, Any]:
+        looked_up = self.hits + self.misses
+        return {
+            "slides": len(self._slides),
+            "current": self.current.id if self.current else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / looked_up, 3) if looked_up else 0.0
+        }
+
+    def export(self) -> dict[str, Any]:
+        return {
+            "next_id": self._next_id,
+            "current": self.current.id if self.current else None,
+            "slides": [s.export() for s in self._slides.values()]
+        }
+
+    def restore(self, state: Optional[dict[str, Any]]):
+        if not state:
+            return
+        self._slides = OrderedDict((s.id, s) for s in map(Slide.load, state.get("slides", [])))
+        self._next_id = int(state.get("next_id", len(self._slides) + 1))
+        self.current = self._slides.get(state.get("current"))
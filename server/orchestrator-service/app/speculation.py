@@ -0,0 +1,62 @@
+import time
+import asyncio
+from difflib import SequenceMatcher
+from typing import Any, Optional
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().strip(" ¿?.!,").split())
+
+
+def similarity(a: str, b: str) -> float:
+    return SequenceMatcher(None, normalize(a), normalize(b)).ratio()
+
+
+def estimate_tokens(text: str) -> int:
+    """Aproximación de ~4 caracteres por token; el servicio LLM no expone el uso real."""
+    return max(1, len(text) // 4)
+
+
+class Speculation:
+    """Respuesta generada a partir de un transcript parcial que aún no es pregunta confirmada."""
+
+    def __init__(self, text: str, prompt: str, task: asyncio.Task, slide_id: Optional[str] = None):
+        self.text = text
+        self.slide_id = slide_id    # diapositiva en pantalla cuando se lanzó
+        self.prompt_tokens = estimate_tokens(prompt)
+        self.task = task
+        self.started_at = time.monotonic()
+
+    def wasted_tokens(self) -> int:
+        """Tokens gastados si la especulación se descarta."""
+        if self.task.done() and not self.task.cancelled() and self.task.exception() is None:
+            return self.prompt_tokens + estimate_tokens(self.task.result())
+        return self.prompt_tokens
+
+
+class SpeculationStats:
+    def __init__(self):
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted_tokens = 0
+        self.saved_s = 0.0
+
+    def hit(self, spec: Speculation):
+        self.hits += 1
+        self.saved_s += time.monotonic() - spec.started_at
+
+    def miss(self, spec: Speculation):
+        self.misses += 1
+        self.wasted_tokens += spec.wasted_tokens()
+
+    def snapshot(self) -> dict[str, Any]:
+        resolved = self.hits + self.misses
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / resolved, 3) if resolved else 0.0,
+            "wasted_tokens_est": self.wasted_tokens,
+            "head_start_s": round(self.saved_s, 3)
+        }
@@ -0,0 +1,125 @@
+import json
+import time
+from typing import Any, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # solo hace falta con SESSION_STATE_URL=redis://...
+    aioredis = None
+
+KEY_PREFIX = "orchestrator"
+SUSPENDED_KEY = f"{KEY_PREFIX}:suspended"
+
+
+class MemoryStateBackend:
+    """Estado de sesión en el propio proceso: un solo worker, se pierde al reiniciar."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._sessions: dict[str, tuple[float, dict[str, Any]]] = {}
+        self._suspended: dict[str, float] = {}
+        self._next_prune = 0.0
+
+    async def load(self, meeting_id: str) -> Optional[dict[str, Any]]:
+        entry = self._sessions.get(meeting_id)
+        if entry is None or entry[0] < time.time():
+            self._sessions.pop(meeting_id, None)
+            return None
+        return entry[1]
+
+    async def save(self, meeting_id: str, state: dict[str, Any]):
+        now = time.time()
+        self._sessions[meeting_id] = (now + self.ttl, state)
+        # Las sesiones que nunca vuelven caducan aunque nadie las lea
+        if now >= self._next_prune:
+            self._next_prune = now + 60
+            for key in [k for k, (expires, _) in self._sessions.items() if expires < now]:
+                del self._sessions[key]
+
+    async def delete(self, meeting_id: str):
+        self._sessions.pop(meeting_id, None)
+
+    async def mark_suspended(self, meeting_id: str, at: float):
+        self._suspended[meeting_id] = at
+
+    async def unmark_suspended(self, meeting_id: str):
+        self._suspended.pop(meeting_id, None)
+
+    async def suspended_before(self, ts: float) -> list[tuple[str, float]]:
+        return [(m, at) for m, at in self._suspended.items() if at < ts]
+
+    async def claim_suspended(self, meeting_id: str) -> bool:
+        return self._suspended.pop(meeting_id, None) is not None
+
+    async def heartbeat(self, worker: str, ttl: float):
+        pass
+
+    async def live_workers(self) -> Optional[set[str]]:
+        """None = no se sabe; el router usa la lista estática de workers."""
+        return None
+
+    async def close(self):
+        pass
+
+
+class RedisStateBackend:
+    """Estado compartido en Redis (o compatible: KeyDB, Valkey, Dragonfly).
+
+    Cada sesión es una clave JSON con TTL; cada worker renueva su propia clave
+    de latido, y así el router sabe qué workers siguen vivos. Las reuniones
+    suspendidas van en un sorted set (sin TTL, puntuación = hora de suspensión)
+    para que cualquier worker pueda darlas por terminadas aunque el que las
+    suspendió ya no exista.
+    """
+
+    def __init__(self, url: str, ttl: float):
+        if aioredis is None:
+            raise RuntimeError("SESSION_STATE_URL=redis://... requiere el paquete redis")
+        self.ttl = ttl
+        self._redis = aioredis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _session_key(meeting_id: str) -> str:
+        return f"{KEY_PREFIX}:session:{meeting_id}"
+
+    async def load(self, meeting_id: str) -> Optional[dict[str, Any]]:
+        raw = await self._redis.get(self._session_key(meeting_id))
+        return json.loads(raw) if raw else None
+
+    async def save(self, meeting_id: str, state: dict[str, Any]):
+        await self._redis.set(self._session_key(meeting_id), json.dumps(state), ex=int(self.ttl))
+
+    async def delete(self, meeting_id: str):
+        await self._redis.delete(self._session_key(meeting_id))
+
+    async def mark_suspended(self, meeting_id: str, at: float):
+        await self._redis.zadd(SUSPENDED_KEY, {meeting_id: at})
+
+    async def unmark_suspended(self, meeting_id: str):
+        await self._redis.zrem(SUSPENDED_KEY, meeting_id)
+
+    async def suspended_before(self, ts: float) -> list[tuple[str, float]]:
+        return await self._redis.zrangebyscore(SUSPENDED_KEY, "-inf", f"({ts}", withscores=True)
+
+    async def claim_suspended(self, meeting_id: str) -> bool:
+        """ZREM es atómico: solo un worker recoge cada reunión."""
+        return await self._redis.zrem(SUSPENDED_KEY, meeting_id) == 1
+
+    async def heartbeat(self, worker: str, ttl: float):
+        await self._redis.set(f"{KEY_PREFIX}:worker:{worker}", time.time(), ex=max(1, int(ttl)))
+
+    async def live_workers(self) -> Optional[set[str]]:
+        prefix = f"{KEY_PREFIX}:worker:"
+        return {key[len(prefix):] async for key in self._redis.scan_iter(match=f"{prefix}*")}
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def make_state_backend(url: str, ttl: float):
+    """memory:// (por defecto) o redis://host:6379/0."""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateBackend(url, ttl)
+    if url.startswith("memory://"):
+        return MemoryStateBackend(ttl)
+    raise ValueError(f"SESSION_STATE_URL no soportada: {url}")
@@ -0,0 +1,224 @@
+import json
+import time
+import asyncio
+import sqlite3
+from typing import Any, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    id          TEXT PRIMARY KEY,
+    title       TEXT,
+    started_at  REAL NOT NULL,
+    ended_at    REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    meeting_id  TEXT NOT NULL REFERENCES meetings(id),
+    ts          REAL NOT NULL,
+    kind        TEXT NOT NULL,
+    speaker     TEXT,
+    text        TEXT NOT NULL DEFAULT '',
+    data        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_meetings_started_id ON meetings(started_at, id);
+CREATE INDEX IF NOT EXISTS idx_events_meeting_ts ON events(meeting_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts);
+-- Hablante: lo rellena la diarización del modo batch (--db)
+CREATE INDEX IF NOT EXISTS idx_events_speaker ON events(meeting_id, speaker, id) WHERE speaker IS NOT NULL;
+
+-- Búsqueda de texto completo sobre transcripts y texto de diapositivas
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+    text, content='events', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events
+WHEN new.kind IN ('transcript', 'ocr') BEGIN
+    INSERT INTO events_fts(rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+SEARCHABLE_KINDS = ("transcript", "ocr")
+
+
+def fts_query(q: str) -> str:
+    """Convierte texto libre en una consulta FTS5 segura (cada término entre comillas)."""
+    terms = [t.replace('"', '""') for t in q.split()]
+    return " ".join(f'"{t}"' for t in terms)
+
+
+class MeetingStore:
+    """Almacén append-only de reuniones en SQLite (WAL).
+
+    Las escrituras se encolan sin bloquear el pipeline y un único writer las
+    vuelca por lotes en una transacción; las lecturas abren su propia conexión,
+    así que WAL les permite correr en paralelo con el writer.
+    """
+
+    def __init__(self, path: str, batch_size: int = 200, flush_interval: float = 0.5,
+                 max_pending: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: asyncio.Queue[tuple[str, tuple]] = asyncio.Queue(maxsize=max_pending)
+        self._writer: Optional[asyncio.Task] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    async def start(self):
+        def init():
+            conn = self._connect()
+            conn.executescript(SCHEMA)
+            return conn
+        self._conn = await asyncio.to_thread(init)
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def close(self):
+        if self._writer:
+            # Centinela en vez de cancel(): wait_for puede tragarse la cancelación
+            # si el get() ya había terminado, y el writer quedaría colgado.
+            # El writer vuelca lo que queda en cola antes de salir.
+            await self._queue.put(("stop", ()))
+            await self._writer
+        if self._conn:
+            self._conn.close()
+
+    # ——— Escritura ———————————————————————————————————————————————————————
+    def _enqueue(self, op: str, row: tuple):
+        try:
+            self._queue.put_nowait((op, row))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def open_meeting(self, meeting_id: str, title: Optional[str] = None,
+                     started_at: Optional[float] = None):
+        self._enqueue("open", (meeting_id, title, started_at or time.time()))
+
+    def close_meeting(self, meeting_id: str, ended_at: Optional[float] = None):
+        self._enqueue("close", (ended_at or time.time(), meeting_id))
+
+    def append(self, meeting_id: str, kind: str, text: str = "",
+               speaker: Optional[str] = None, data: Optional[dict[str, Any]] = None,
+               ts: Optional[float] = None):
+        payload = json.dumps(data, ensure_ascii=False) if data is not None else None
+        self._enqueue("event", (meeting_id, ts or time.time(), kind, speaker, text, payload))
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1][0] != "stop":
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                print(f"[store] Error escribiendo lote de {len(batch)} eventos: {e}")
+            if batch[-1][0] == "stop":
+                return
+
+    def _write_batch(self, batch: list[tuple[str, tuple]]):
+        with self._conn:
+            for op, row in batch:
+                if op == "event":
+                    self._conn.execute(
+                        "INSERT INTO events(meeting_id, ts, kind, speaker, text, data) VALUES (?, ?, ?, ?, ?, ?)",
+                        row
+                    )
+                elif op == "open":
+                    # Una reunión retomada (reconexión u otro worker) vuelve a estar abierta
+                    self._conn.execute(
+                        "INSERT INTO meetings(id, title, started_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET ended_at = NULL", row
+                    )
+                elif op == "close":
+                    self._conn.execute("UPDATE meetings SET ended_at = ? WHERE id = ?", row)
+
+    # ——— Lectura —————————————————————————————————————————————————————————
+    def _query(self, sql: str, params: tuple) -> list[dict[str, Any]]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        result = []
+        for row in rows:
+            item = dict(row)
+            if item.get("data"):
+                item["data"] = json.loads(item["data"])
+            result.append(item)
+        return result
+
+    async def list_meetings(self, limit: int = 20, before: Optional[float] = None,
+                            before_id: Optional[str] = None) -> list[dict]:
+        """Reuniones más recientes primero; el cursor es (started_at, id) del último elemento visto.
+
+        El id desempata reuniones con el mismo started_at para no saltarse ninguna entre páginas.
+        """
+        sql = """
+            SELECT m.id, m.title, m.started_at, m.ended_at,
+                   (SELECT text FROM events e
+                     WHERE e.meeting_id = m.id AND e.kind = 'summary'
+                     ORDER BY e.ts DESC LIMIT 1) AS summary
+              FROM meetings m
+             WHERE (m.started_at, m.id) < (?, ?)
+             ORDER BY m.started_at DESC, m.id DESC
+             LIMIT ?
+        """
+        if before is None:
+            before, before_id = float("inf"), ""
+        elif before_id is None:
+            # Solo started_at: todas las reuniones de ese instante ya se vieron
+            before_id = ""
+        return await asyncio.to_thread(self._query, sql, (before, before_id, limit))
+
+    async def get_meeting(self, meeting_id: str) -> Optional[dict]:
+        rows = await asyncio.to_thread(
+            self._query, "SELECT * FROM meetings WHERE id = ?", (meeting_id,)
+        )
+        return rows[0] if rows else None
+
+    async def events(self, meeting_id: str, kind: Optional[str] = None,
+                     speaker: Optional[str] = None, after_id: int = 0,
+                     limit: int = 100) -> list[dict]:
+        """Eventos de una reunión en orden; paginación por cursor sobre `id`."""
+        sql = "SELECT * FROM events WHERE meeting_id = ? AND id > ?"
+        params: list[Any] = [meeting_id, after_id]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        if speaker:
+            sql += " AND speaker = ?"
+            params.append(speaker)
+        sql += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        return await asyncio.to_thread(self._query, sql, tuple(params))
+
+    async def search(self, q: str, meeting_id: Optional[str] = None, limit: int = 20) -> list[dict]:
+        query = fts_query(q)
+        if not query:
+            return []
+        sql = """
+            SELECT e.id, e.meeting_id, e.ts, e.kind, e.speaker,
+                   snippet(events_fts, 0, '[', ']', '…', 12) AS snippet
+              FROM events_fts JOIN events e ON e.id = events_fts.rowid
+             WHERE events_fts MATCH ?
+        """
+        params: list[Any] = [query]
+        if meeting_id:
+            sql += " AND e.meeting_id = ?"
+            params.append(meeting_id)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        return await asyncio.to_thread(self._query, sql, tuple(params))
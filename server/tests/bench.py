@@ -0,0 +1,343 @@
+# server/tests/bench.py
+"""
+Benchmark de carga y latencia de extremo a extremo.
+
+Reproduce los fixtures (tests/*.wav, el stream MediaRecorder de tests/webm_stream
+y sample_slide.png) contra cada servicio y contra el WebSocket del orquestador,
+con concurrencia configurable, y reporta p50/p95/p99 y throughput por etapa.
+
+Para resultados reproducibles, apunta llm-service al mock local:
+
+    python mock_llm.py --port 8005 --delay 0.5
+    python bench.py --targets cv,audio,llm --requests 50 --concurrency 8 --out run.json
+    python bench.py --targets orchestrator --sessions 4 --speed 4 --out run.json
+    python bench.py ... --out new.json --baseline run.json --tolerance 0.15
+
+Para medir la etapa de frames del orquestador en cada envío, arráncalo con
+SSIM_THRESHOLD=1.01 FRAME_COOLDOWN=0; si no, el filtro de cambios descarta los
+frames repetidos.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import pathlib
+import argparse
+import platform
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+import httpx
+import websockets
+
+ROOT = pathlib.Path(__file__).parent
+SLIDE = ROOT / "sample_slide.png"
+WAVS = sorted(ROOT.glob("*.wav"))
+WEBMS = sorted((ROOT / "webm_stream").glob("*.webm"))
+
+SERVICES = {
+    "cv": os.getenv("BASE_CV", "http://localhost:8000"),
+    "audio": os.getenv("BASE_AUDIO", "http://localhost:8002"),
+    "llm": os.getenv("BASE_AI", "http://localhost:8001"),
+    "orchestrator": os.getenv("BASE_ORCHESTRATOR", "ws://localhost:8003/ws/orchestrator")
+}
+
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+CLUSTER_ID = b"\x1f\x43\xb6\x75"
+
+# Cadencia del cliente web (MeetingPage): un frame cada 3 s y audio cada ~6 s
+FRAME_INTERVAL = 3.0
+AUDIO_INTERVAL = 6.0
+
+
+# ——— Estadísticas ————————————————————————————————————————————————————————
+class Recorder:
+    """Latencias (s) y errores por etapa."""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def error(self, stage: str):
+        self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    async def timed(self, stage: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Mide `call` bajo `stage` y devuelve su resultado (None si falló)."""
+        start = time.perf_counter()
+        try:
+            result = await call()
+        except Exception as e:
+            self.error(stage)
+            print(f"[{stage}] error: {e}", file=sys.stderr)
+            return None
+        self.add(stage, time.perf_counter() - start)
+        return result
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Percentil con interpolación lineal (valores ya ordenados)."""
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def summarize(rec: Recorder, wall: float) -> dict[str, dict[str, float]]:
+    stages = {}
+    for stage in sorted(set(rec.samples) | set(rec.errors)):
+        values = sorted(rec.samples.get(stage, []))
+        stages[stage] = {
+            "count": len(values),
+            "errors": rec.errors.get(stage, 0),
+            "p50_ms": ms(percentile(values, 50)),
+            "p95_ms": ms(percentile(values, 95)),
+            "p99_ms": ms(percentile(values, 99)),
+            "mean_ms": ms(sum(values) / len(values)) if values else 0.0,
+            "max_ms": ms(values[-1]) if values else 0.0,
+            "throughput_rps": round(len(values) / wall, 3) if wall else 0.0
+        }
+    return stages
+
+
+# ——— Fixtures ————————————————————————————————————————————————————————————
+def load_webm_stream() -> list[bytes]:
+    """Blobs de un mismo MediaRecorder en orden: el primero trae la cabecera, el resto son clusters."""
+    return [p.read_bytes() for p in WEBMS]
+
+
+def webm_header(first: bytes) -> bytes:
+    idx = first.find(CLUSTER_ID)
+    return first[:idx] if first.startswith(EBML_MAGIC) and idx > 0 else b""
+
+
+def standalone_webm_chunks() -> list[bytes]:
+    """Cada chunk con la cabecera del stream, como lo reenvía el orquestador."""
+    chunks = load_webm_stream()
+    if not chunks:
+        return []
+    header = webm_header(chunks[0])
+    return [c if c.startswith(EBML_MAGIC) else header + c for c in chunks]
+
+
+# ——— Etapas HTTP ———————————————————————————————————————————————————————————
+async def run_pool(n_requests: int, concurrency: int, make_call: Callable[[int], Awaitable[None]]):
+    counter = iter(range(n_requests))
+
+    async def worker():
+        for i in counter:
+            await make_call(i)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def bench_cv(client: httpx.AsyncClient, rec: Recorder, args):
+    image = SLIDE.read_bytes()
+
+    async def call(i: int):
+        async def post():
+            files = {"file": ("slide.png", image, "image/png")}
+            r = await client.post(f"{SERVICES['cv']}/process_frame", files=files)
+            r.raise_for_status()
+        await rec.timed("cv.process_frame", post)
+
+    await run_pool(args.requests, args.concurrency, call)
+
+
+async def bench_audio(client: httpx.AsyncClient, rec: Recorder, args):
+    clips = [(p.name, p.read_bytes(), "audio/wav") for p in WAVS]
+    clips += [(f"chunk{i}.webm", c, "audio/webm") for i, c in enumerate(standalone_webm_chunks())]
+
+    async def call(i: int):
+        name, data, mime = clips[i % len(clips)]
+        stage = f"audio.transcribe.{'webm' if mime == 'audio/webm' else 'wav'}"
+
+        async def transcribe():
+            r = await client.post(f"{SERVICES['audio']}/transcribe", files={"file": (name, data, mime)})
+            r.raise_for_status()
+            return r.json().get("transcript", "")
+
+        transcript = await rec.timed(stage, transcribe)
+        if transcript is None:
+            return
+
+        async def detect():
+            r = await client.post(f"{SERVICES['audio']}/detect_questions", json={"transcript": transcript})
+            r.raise_for_status()
+        await rec.timed("audio.detect_questions", detect)
+
+    await run_pool(args.requests, args.concurrency, call)
+
+
+async def bench_llm(client: httpx.AsyncClient, rec: Recorder, args):
+    payload = {
+        "text": ["2.5 Professional Development", "Certification"],
+        "ui": ["Header"],
+        "audio_meta": "What is this section about?"
+    }
+
+    async def call(i: int):
+        async def post():
+            r = await client.post(f"{SERVICES['llm']}/generate_answer", json=payload)
+            r.raise_for_status()
+        await rec.timed("llm.generate_answer", post)
+
+    await run_pool(args.requests, args.concurrency, call)
+
+
+# ——— Orquestador (WebSocket) ——————————————————————————————————————————————
+async def orchestrator_session(rec: Recorder, args):
+    slide = "data:image/png;base64," + base64.b64encode(SLIDE.read_bytes()).decode()
+    chunks = load_webm_stream()
+    frame_interval = FRAME_INTERVAL / args.speed
+    audio_interval = AUDIO_INTERVAL / args.speed
+
+    last_frame_sent: list[float] = [0.0]
+    audio_sent: deque[float] = deque()
+    questions_at: dict[str, float] = {}
+
+    async with websockets.connect(SERVICES["orchestrator"], max_size=None) as ws:
+        async def sender():
+            next_frame = time.perf_counter()
+            for chunk in chunks:
+                now = time.perf_counter()
+                while next_frame <= now:
+                    await ws.send(json.dumps({"type": "frame", "data": slide}))
+                    last_frame_sent[0] = time.perf_counter()
+                    next_frame += frame_interval
+                await ws.send(json.dumps({"type": "audio", "data": base64.b64encode(chunk).decode()}))
+                audio_sent.append(time.perf_counter())
+                await asyncio.sleep(audio_interval)
+
+        async def receiver():
+            async for raw in ws:
+                msg = json.loads(raw)
+                now = time.perf_counter()
+                kind = msg.get("type")
+                if kind == "frame_processed" and last_frame_sent[0]:
+                    # Latest-wins: se mide contra el último frame enviado
+                    rec.add("orchestrator.frame", now - last_frame_sent[0])
+                elif kind == "transcript" and audio_sent:
+                    # El audio pendiente se procesa en un lote: se mide desde el chunk más antiguo
+                    rec.add("orchestrator.transcript", now - audio_sent[0])
+                    audio_sent.clear()
+                elif kind == "questions":
+                    for q in msg.get("data", []):
+                        questions_at[q] = now
+                elif kind == "answer":
+                    asked = questions_at.pop(msg.get("question", ""), None)
+                    if asked is not None:
+                        rec.add("orchestrator.question_to_answer", now - asked)
+                elif kind == "error":
+                    rec.error("orchestrator")
+
+        recv_task = asyncio.create_task(receiver())
+        try:
+            await sender()
+            # Margen para que terminen las etapas en curso
+            await asyncio.sleep(args.drain)
+        finally:
+            recv_task.cancel()
+            await asyncio.gather(recv_task, return_exceptions=True)
+
+
+
+async def bench_orchestrator(rec: Recorder, args):
+    async def session(i: int):
+        try:
+            await orchestrator_session(rec, args)
+        except Exception as e:
+            rec.error("orchestrator.session")
+            print(f"[orchestrator] sesión {i} falló: {e}", file=sys.stderr)
+
+    await asyncio.gather(*(session(i) for i in range(args.sessions)))
+
+
+# ——— Comparación con una ejecución previa ——————————————————————————————————
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Devuelve las etapas cuyo p95 empeoró más que `tolerance` (fracción)."""
+    regressions = []
+    for stage, stats in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base or not base.get("p95_ms"):
+            continue
+        change = (stats["p95_ms"] - base["p95_ms"]) / base["p95_ms"]
+        marker = "REGRESIÓN" if change > tolerance else "ok"
+        print(f"{stage:40s} p95 {base['p95_ms']:>9.1f} → {stats['p95_ms']:>9.1f} ms ({change:+.1%}) {marker}")
+        if change > tolerance:
+            regressions.append(stage)
+    return regressions
+
+
+async def main(args) -> int:
+    rec = Recorder()
+    targets = set(args.targets.split(","))
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        jobs = []
+        if "cv" in targets:
+            jobs.append(bench_cv(client, rec, args))
+        if "audio" in targets:
+            jobs.append(bench_audio(client, rec, args))
+        if "llm" in targets:
+            jobs.append(bench_llm(client, rec, args))
+        if "orchestrator" in targets:
+            jobs.append(bench_orchestrator(rec, args))
+        if args.sequential:
+            for job in jobs:
+                await job
+        else:
+            await asyncio.gather(*jobs)
+    wall = time.perf_counter() - start
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": platform.node(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        "services": SERVICES,
+        "wall_s": round(wall, 3),
+        "stages": summarize(rec, wall)
+    }
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        pathlib.Path(args.out).write_text(text, encoding="utf-8")
+    print(text)
+
+    if args.baseline:
+        baseline = json.loads(pathlib.Path(args.baseline).read_text(encoding="utf-8"))
+        if compare(result, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", default="cv,audio,llm,orchestrator",
+                        help="etapas a medir, separadas por coma")
+    parser.add_argument("--requests", type=int, default=20, help="peticiones por servicio HTTP")
+    parser.add_argument("--concurrency", type=int, default=4, help="peticiones HTTP simultáneas por servicio")
+    parser.add_argument("--sessions", type=int, default=2, help="sesiones WebSocket simultáneas")
+    parser.add_argument("--speed", type=float, default=1.0, help="factor de aceleración de la cadencia del cliente")
+    parser.add_argument("--drain", type=float, default=15.0, help="segundos de espera tras el último envío")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--sequential", action="store_true", help="medir los servicios uno tras otro")
+    parser.add_argument("--out", help="ruta del JSON de resultados")
+    parser.add_argument("--baseline", help="JSON de una ejecución previa para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="empeoramiento de p95 tolerado (fracción)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,112 @@
+# server/tests/mock_llm.py
+"""
+Sustituto local y determinista de la API OpenAI-compatible (/chat/completions).
+
+Permite correr llm-service y el orquestador sin un LLM real:
+
+    python mock_llm.py --port 8005 --delay 0.5 --token-delay 0.01
+    AI_ML_API_URL=http://localhost:8005/v1 uvicorn app.main:app --port 8001   # en llm-service
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+# Latencia hasta el primer token y entre tokens (segundos)
+DELAY = float(os.getenv("MOCK_LLM_DELAY", "0.5"))
+TOKEN_DELAY = float(os.getenv("MOCK_LLM_TOKEN_DELAY", "0.0"))
+
+app = FastAPI(title="Mock LLM", description="OpenAI-compatible determinista para benchmarks")
+
+
+def build_answer(messages: list[dict], max_tokens: int | None) -> str:
+    """Misma entrada → misma respuesta; la longitud depende del prompt, no del azar."""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+    last_user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    words = f"Respuesta simulada {digest}: {last_user}".split()[:80]
+    if max_tokens:
+        words = words[:max_tokens]
+    return " ".join(words)
+
+
+def usage(messages: list[dict], answer: str) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+    completion_tokens = len(answer) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+@app.post("/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    model = body.get("model", "mock")
+    answer = build_answer(messages, body.get("max_tokens"))
+    created = int(time.time())
+    completion_id = f"chatcmpl-mock-{hashlib.sha1(answer.encode()).hexdigest()[:12]}"
+
+    await asyncio.sleep(DELAY)
+
+    if not body.get("stream"):
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop"
+            }],
+            "usage": usage(messages, answer)
+        }
+
+    async def event_stream():
+        for i, word in enumerate(answer.split(" ")):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else f" {word}"},
+                    "finish_reason": None
+                }]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            if TOKEN_DELAY:
+                await asyncio.sleep(TOKEN_DELAY)
+        done = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        }
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8005)
+    parser.add_argument("--delay", type=float, default=DELAY, help="segundos hasta la respuesta")
+    parser.add_argument("--token-delay", type=float, default=TOKEN_DELAY, help="segundos entre tokens (stream)")
+    args = parser.parse_args()
+    DELAY, TOKEN_DELAY = args.delay, args.token_delay
+    uvicorn.run(app, host="0.0.0.0", port=args.port)
@@ -0,0 +1,71 @@
+# server/tests/test_backpressure.py
+# Pruebas unitarias de las colas acotadas del orchestrator (no requieren servicios arriba)
+import asyncio
+import importlib.util
+import pathlib
+
+# Cada servicio tiene su propio paquete `app`: se carga el módulo por ruta para no mezclarlos
+_spec = importlib.util.spec_from_file_location(
+    "orchestrator_backpressure",
+    pathlib.Path(__file__).parent.parent / "orchestrator-service" / "app" / "backpressure.py"
+)
+backpressure = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(backpressure)
+
+
+def test_latest_queue_keeps_newest_and_counts_drops():
+    async def run():
+        queue = backpressure.LatestQueue(maxsize=1)
+        for frame in (b"a", b"b", b"c"):
+            queue.put(frame)
+        assert queue.qsize() == 1
+        assert queue.dropped == 2
+        _, item = await queue.get()
+        return item
+    assert asyncio.run(run()) == b"c"
+
+
+def test_latest_queue_drops_oldest_when_full():
+    async def run():
+        queue = backpressure.LatestQueue(maxsize=2)
+        for frame in (b"a", b"b", b"c"):
+            queue.put(frame)
+        return queue.dropped, [(await queue.get())[1] for _ in range(2)]
+    assert asyncio.run(run()) == (1, [b"b", b"c"])
+
+
+def test_coalescing_queue_delivers_all_chunks_together():
+    async def run():
+        queue = backpressure.CoalescingQueue(max_bytes=100)
+        for chunk in (b"12", b"34", b"56"):
+            queue.put(chunk)
+        _, chunks = await queue.get()
+        return queue, chunks
+    queue, chunks = asyncio.run(run())
+    assert chunks == [b"12", b"34", b"56"]
+    assert queue.coalesced == 2
+    assert queue.dropped == 0
+    assert queue.pending_bytes() == 0
+
+
+def test_coalescing_queue_drops_oldest_over_byte_cap():
+    async def run():
+        queue = backpressure.CoalescingQueue(max_bytes=10)
+        for chunk in (b"aaaa", b"bbbb", b"cccc"):
+            queue.put(chunk)
+        assert queue.pending_bytes() == 8
+        _, chunks = await queue.get()
+        return queue, chunks
+    queue, chunks = asyncio.run(run())
+    assert chunks == [b"bbbb", b"cccc"]
+    assert queue.dropped == 1
+
+
+def test_coalescing_queue_keeps_single_oversized_chunk():
+    async def run():
+        queue = backpressure.CoalescingQueue(max_bytes=4)
+        queue.put(b"0123456789")
+        return queue, (await queue.get())[1]
+    queue, chunks = asyncio.run(run())
+    assert chunks == [b"0123456789"]
+    assert queue.dropped == 0
@@ -1,6 +1,7 @@
 # server/tests/test_endpoint.py
 import os
 import pathlib
+import uuid
 import pytest
 from httpx import AsyncClient
 
@@ -45,6 +46,23 @@ async def test_cv_detect_ui():
     assert "ui_detections" in body
     assert isinstance(body["ui_detections"], list)
 
+@pytest.mark.asyncio
+async def test_cv_process_frame_roi():
+    img_path = FIXTURES / "sample_slide.png"  # 1919 x 1037
+    async with AsyncClient() as client:
+        with img_path.open("rb") as img:
+            files = {"file": ("slide.png", img, "image/png")}
+            r = await client.post(f"{BASE_CV}/process_frame", files=files, timeout=30.0)
+    assert r.status_code == 200, r.text
+    roi = r.json()["roi"]
+    x1, y1, x2, y2 = roi["bbox"]
+    assert 0 <= x1 < x2 <= 1919 and 0 <= y1 < y2 <= 1037
+    assert 0 < roi["ocr_pixels_ratio"] <= 1
+    # Las cajas vuelven en coordenadas del frame original, no del recorte
+    for det in r.json()["ui_detections"]:
+        bx1, by1, bx2, by2 = det["bbox"]
+        assert x1 - 1 <= bx1 <= bx2 <= x2 + 1 and y1 - 1 <= by1 <= by2 <= y2 + 1
+
 @pytest.mark.asyncio
 async def test_audio_transcribe_and_detect():
     wav_path = FIXTURES / "pregunta3.wav"
@@ -72,6 +90,27 @@ async def test_audio_transcribe_and_detect():
     assert r2.status_code == 200, r2.text
     assert isinstance(r2.json().get("questions"), list)
 
+@pytest.mark.asyncio
+async def test_audio_detect_questions_stream():
+    segments = [
+        {"text": "what is the deadline for the project", "start": 0.0, "end": 2.4},
+        {"text": "we have to ship in june", "start": 3.6, "end": 5.0},
+    ]
+    async with AsyncClient() as client:
+        r = await client.post(
+            f"{BASE_AUDIO}/detect_questions/stream",
+            json={"session_id": "pytest", "segments": segments, "final": True},
+            timeout=10.0
+        )
+    assert r.status_code == 200, r.text
+    questions = r.json().get("questions")
+    assert isinstance(questions, list)
+    assert all(0.0 <= q["confidence"] <= 1.0 for q in questions)
+    # La pausa de 1.2 s cierra la primera frase, que es una pregunta clara
+    first = next((q for q in questions if q["text"] == segments[0]["text"]), None)
+    assert first is not None, questions
+    assert first["confidence"] >= 0.5
+
 @pytest.mark.asyncio
 async def test_audio_diarize():
     wav_path = FIXTURES / "reunion.wav"
@@ -91,6 +130,25 @@ async def test_audio_diarize():
     if segments:
         assert all(k in segments[0] for k in ("start", "end", "speaker"))
 
+@pytest.mark.asyncio
+async def test_audio_session_ring():
+    wav_path = FIXTURES / "reunion.wav"
+    async with AsyncClient() as client:
+        with wav_path.open("rb") as wav:
+            files = {"file": ("reunion.wav", wav, "audio/wav")}
+            r = await client.post(f"{BASE_AUDIO}/transcribe?session_id=pytest-ring", files=files, timeout=20.0)
+        assert r.status_code == 200, r.text
+        info = await client.get(f"{BASE_AUDIO}/sessions/pytest-ring/audio/info", timeout=5.0)
+        assert info.status_code == 200, info.text
+        assert info.json()["records"] >= 1
+        audio = await client.get(f"{BASE_AUDIO}/sessions/pytest-ring/audio?seconds=5", timeout=20.0)
+        assert audio.status_code == 200, audio.text
+        assert audio.content[:4] == b"RIFF"
+        r = await client.delete(f"{BASE_AUDIO}/sessions/pytest-ring", timeout=5.0)
+        assert r.status_code == 200, r.text
+        missing = await client.get(f"{BASE_AUDIO}/sessions/pytest-ring/audio/info", timeout=5.0)
+    assert missing.status_code == 404
+
 @pytest.mark.asyncio
 async def test_ai_generate_answer():
     payload = {
@@ -108,8 +166,70 @@ async def test_ai_generate_answer():
     body = r.json()
     assert "answer" in body
 
+@pytest.mark.asyncio
+async def test_ai_generate_answer_slide_ref():
+    ref = f"pytest/s1.{uuid.uuid4().hex[:8]}"
+    context = "Texto en pantalla:\nTest OCR\nElementos UI: button"
+    async with AsyncClient() as client:
+        first = await client.post(
+            f"{BASE_AI}/generate_answer",
+            json={"audio_meta": "¿Prueba?", "context": context, "slide_ref": ref},
+            timeout=10.0
+        )
+        # Segunda pregunta sobre la misma diapositiva: solo la referencia
+        cached = await client.post(
+            f"{BASE_AI}/generate_answer",
+            json={"audio_meta": "¿Y ahora?", "slide_ref": ref},
+            timeout=10.0
+        )
+        unknown = await client.post(
+            f"{BASE_AI}/generate_answer",
+            json={"audio_meta": "¿Y ahora?", "slide_ref": f"{ref}-desconocida"},
+            timeout=10.0
+        )
+    assert first.status_code == 200, first.text
+    assert cached.status_code == 200, cached.text
+    assert "answer" in cached.json()
+    assert unknown.status_code == 409
+
 @pytest.mark.asyncio
 async def test_filter_docs():
     async with AsyncClient() as client:
         r = await client.get(f"{BASE_FILTER}/docs", timeout=5.0)
     assert r.status_code == 200
+
+@pytest.mark.asyncio
+async def test_filter_sessions_lag():
+    async with AsyncClient() as client:
+        r = await client.get(f"{BASE_FILTER}/sessions", timeout=5.0)
+    assert r.status_code == 200, r.text
+    assert isinstance(r.json().get("sessions"), list)
+
+@pytest.mark.asyncio
+async def test_filter_meeting_history():
+    async with AsyncClient() as client:
+        r = await client.get(f"{BASE_FILTER}/meetings", params={"limit": 5}, timeout=5.0)
+        assert r.status_code == 200, r.text
+        assert isinstance(r.json().get("meetings"), list)
+
+        r = await client.get(f"{BASE_FILTER}/search", params={"q": "certification"}, timeout=5.0)
+        assert r.status_code == 200, r.text
+        assert isinstance(r.json().get("results"), list)
+
+@pytest.mark.asyncio
+async def test_filter_route_is_stable():
+    async with AsyncClient() as client:
+        first = await client.get(f"{BASE_FILTER}/route/meeting-123", timeout=5.0)
+        second = await client.get(f"{BASE_FILTER}/route/meeting-123", timeout=5.0)
+    assert first.status_code == 200, first.text
+    body = first.json()
+    assert body["owner"] == second.json()["owner"]
+    assert body["ws_url"].endswith("/ws/orchestrator?meeting_id=meeting-123")
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("base", [BASE_CV, BASE_AUDIO, BASE_AI, BASE_FILTER])
+async def test_metrics_exposed(base):
+    async with AsyncClient() as client:
+        r = await client.get(f"{base}/metrics", timeout=5.0)
+    assert r.status_code == 200, r.text
+    assert "http_request_duration_seconds" in r.text
@@ -0,0 +1,39 @@
+# server/tests/test_preprocess.py
+# Pruebas unitarias del recorte de ROI y la escala de inferencia de cv-service (no requieren servicios arriba)
+import importlib.util
+import pathlib
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+# Cada servicio tiene su propio paquete `app`: se carga el módulo por ruta para no mezclarlos
+_spec = importlib.util.spec_from_file_location(
+    "cv_preprocess",
+    pathlib.Path(__file__).parent.parent / "cv-service" / "app" / "preprocess.py"
+)
+preprocess = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(preprocess)
+
+
+def letterboxed_slide() -> np.ndarray:
+    """Diapositiva 4:3 de fondo azul con texto grande, centrada en un frame 16:9 negro."""
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    frame[:, 240:1680] = (160, 90, 40)
+    lines = ["Quarterly revenue", "Growth by region", "Next steps and owners", "Questions welcome"]
+    for i, line in enumerate(lines):
+        cv2.putText(frame, line, (320, 220 + i * 180), cv2.FONT_HERSHEY_SIMPLEX, 3.0, (255, 255, 255), 6)
+    return frame
+
+
+def test_roi_crops_letterbox():
+    prep = preprocess.prepare(letterboxed_slide())
+    x1, _, x2, _ = prep.region
+    assert x1 >= 200 and x2 <= 1720
+
+
+def test_large_text_on_colored_slide_reduces_ocr_scale():
+    prep = preprocess.prepare(letterboxed_slide())
+    assert prep.text_height is not None
+    assert prep.ocr.scale < 1.0
@@ -0,0 +1,87 @@
+# server/tests/test_questions.py
+# Pruebas unitarias del detector de preguntas de audio-service (no requieren servicios arriba)
+import importlib.util
+import pathlib
+
+import pytest
+
+# Cada servicio tiene su propio paquete `app`: se carga el módulo por ruta para no mezclarlos
+_spec = importlib.util.spec_from_file_location(
+    "audio_questions",
+    pathlib.Path(__file__).parent.parent / "audio-service" / "app" / "questions.py"
+)
+questions = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(questions)
+
+
+@pytest.mark.parametrize("text", ["Any questions?", "Ready?", "¿Prueba?", "¿Listos"])
+def test_short_explicit_questions_pass(text):
+    assert questions.question_score(text) >= questions.DEFAULT_THRESHOLD
+
+
+def test_short_utterance_without_punctuation_is_penalized():
+    assert questions.question_score("right") < questions.DEFAULT_THRESHOLD
+
+
+@pytest.mark.parametrize("text", ["Do it now.", "Have this ready by Friday."])
+def test_imperatives_are_not_questions(text):
+    assert questions.question_score(text) < questions.DEFAULT_THRESHOLD
+
+
+@pytest.mark.parametrize("text", ["do we ship today", "does it work", "is it ready"])
+def test_inversion_without_question_mark(text):
+    assert questions.question_score(text) >= questions.DEFAULT_THRESHOLD
+
+
+def test_decimal_point_does_not_split_sentence():
+    detector = questions.QuestionDetector()
+    found = detector.feed([questions.Segment("the price is 3.5 dollars what do you think?", 0.0, 3.0)])
+    assert [q["text"] for q in found] == ["the price is 3.5 dollars what do you think?"]
+
+
+def test_decimal_point_stays_open_until_sentence_ends():
+    assert questions.SENTENCE.findall("we paid 3.5") == []
+    assert questions.SENTENCE.findall("we paid 3.5. ok") == ["we paid 3.5."]
+
+
+@pytest.mark.parametrize("text", [
+    "puedes compartir el enlace",
+    "podrías enviarme el acta",
+    "sabes si llegó el informe",
+    "por que no funciona",
+    "que hora es",
+    "como lo hacemos",
+])
+def test_spanish_questions_without_punctuation(text):
+    assert questions.question_score(text) >= questions.DEFAULT_THRESHOLD
+
+
+@pytest.mark.parametrize("text", ["tienes razón", "es importante", "cuando yo llegue te aviso"])
+def test_spanish_statements(text):
+    assert questions.question_score(text) < questions.DEFAULT_THRESHOLD
+
+
+def test_spanish_yes_no_question_closed_by_pause():
+    detector = questions.QuestionDetector()
+    found = detector.feed([
+        questions.Segment("puedes compartir el enlace", 0.0, 2.0),
+        questions.Segment("bueno seguimos", 4.0, 5.0),
+    ], final=True)
+    assert [q["text"] for q in found] == ["puedes compartir el enlace"]
+
+
+def test_silent_batch_closes_pending_question():
+    detector = questions.QuestionDetector()
+    assert detector.feed([questions.Segment("can you share the link", 0.0, 2.0)], now=2.0) == []
+    assert detector.pending() is not None
+    # Lote siguiente sin texto: solo avanza el reloj
+    found = detector.feed([], now=3.5)
+    assert [q["text"] for q in found] == ["can you share the link"]
+    assert detector.pending() is None
+
+
+def test_short_silence_keeps_sentence_open():
+    detector = questions.QuestionDetector()
+    detector.feed([questions.Segment("can you share", 0.0, 2.0)])
+    assert detector.feed([], now=2.3) == []
+    assert detector.pending()["text"] == "can you share"
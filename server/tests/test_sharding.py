@@ -0,0 +1,61 @@
+# server/tests/test_sharding.py
+# Pruebas unitarias del reparto de sesiones entre workers del orchestrator (no requieren servicios arriba)
+import asyncio
+import importlib.util
+import pathlib
+
+_APP = pathlib.Path(__file__).parent.parent / "orchestrator-service" / "app"
+
+
+def load(name: str, filename: str):
+    # Cada servicio tiene su propio paquete `app`: se carga el módulo por ruta para no mezclarlos
+    spec = importlib.util.spec_from_file_location(name, _APP / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+sharding = load("orchestrator_sharding", "sharding.py")
+state = load("orchestrator_state", "state.py")
+
+WORKERS = ["http://w1:8003", "http://w2:8003", "http://w3:8003"]
+
+
+def test_rendezvous_owner_is_stable_and_order_independent():
+    owner = sharding.rendezvous_owner("meeting-1", WORKERS)
+    assert owner in WORKERS
+    assert sharding.rendezvous_owner("meeting-1", list(reversed(WORKERS))) == owner
+
+
+def test_removing_a_worker_only_moves_its_sessions():
+    keys = [f"meeting-{i}" for i in range(300)]
+    before = {k: sharding.rendezvous_owner(k, WORKERS) for k in keys}
+    after = {k: sharding.rendezvous_owner(k, WORKERS[:2]) for k in keys}
+    moved = [k for k in keys if before[k] != after[k]]
+    assert moved and all(before[k] == WORKERS[2] for k in moved)
+
+
+def test_new_meeting_id_is_owned_by_this_worker():
+    async def run():
+        router = sharding.ShardRouter(WORKERS[1], WORKERS, state.MemoryStateBackend(ttl=60))
+        live = await router.live_workers()
+        ids = [await router.new_meeting_id() for _ in range(20)]
+        return live, ids
+    live, ids = asyncio.run(run())
+    assert live == WORKERS
+    assert len(set(ids)) == 20
+    assert all(sharding.rendezvous_owner(i, WORKERS) == WORKERS[1] for i in ids)
+
+
+def test_suspended_meetings_are_claimed_once():
+    async def run():
+        backend = state.MemoryStateBackend(ttl=60)
+        await backend.mark_suspended("old", 100.0)
+        await backend.mark_suspended("recent", 500.0)
+        expired = await backend.suspended_before(300.0)
+        claims = [await backend.claim_suspended("old"), await backend.claim_suspended("old")]
+        return expired, claims, await backend.suspended_before(1000.0)
+    expired, claims, remaining = asyncio.run(run())
+    assert expired == [("old", 100.0)]
+    assert claims == [True, False]
+    assert remaining == [("recent", 500.0)]
@@ -0,0 +1,76 @@
+# server/tests/test_slides.py
+# Pruebas unitarias del registro de diapositivas del orchestrator (no requieren servicios arriba)
+import importlib.util
+import pathlib
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+# Cada servicio tiene su propio paquete `app`: se carga el módulo por ruta para no mezclarlos
+_spec = importlib.util.spec_from_file_location(
+    "orchestrator_slides",
+    pathlib.Path(__file__).parent.parent / "orchestrator-service" / "app" / "slides.py"
+)
+slides = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(slides)
+
+
+def thumb(seed: int) -> np.ndarray:
+    """Miniatura en gris con bloques aleatorios, como las del FrameGate."""
+    blocks = np.random.default_rng(seed).integers(0, 256, (8, 8), dtype=np.uint8)
+    return cv2.resize(blocks, (160, 90), interpolation=cv2.INTER_NEAREST)
+
+
+def test_hash_tolerates_noise():
+    base = thumb(1)
+    noisy = np.clip(base.astype(np.int16) + np.random.default_rng(7).integers(-3, 4, base.shape), 0, 255)
+    distance = (slides.frame_hash(base) ^ slides.frame_hash(noisy.astype(np.uint8))).bit_count()
+    assert distance <= 8
+    assert (slides.frame_hash(base) ^ slides.frame_hash(thumb(2))).bit_count() > 8
+
+
+def test_lookup_reuses_known_slide():
+    registry = slides.SlideRegistry()
+    key = slides.frame_hash(thumb(1))
+    assert registry.lookup(key) is None
+    added = registry.add(key, ["Roadmap", "Roadmap", "Q3"], ["button", "button"])
+    assert registry.lookup(key) is added
+    assert registry.lookup(slides.frame_hash(thumb(2))) is None
+    assert registry.stats() == {"slides": 1, "current": "s1", "hits": 1, "misses": 2, "hit_rate": 0.333}
+    assert added.context == "Texto en pantalla:\nRoadmap\nQ3\nElementos UI: button ×2"
+
+
+def test_stale_slide_is_reanalyzed_with_new_revision():
+    registry = slides.SlideRegistry(max_age=60)
+    key = slides.frame_hash(thumb(1))
+    first = registry.add(key, ["v1"], [])
+    first.updated_at -= 61
+    assert registry.lookup(key) is None
+    second = registry.add(key, ["v2"], [])
+    assert (second.id, second.revision, second.text) == ("s1", 1, ["v2"])
+    assert len(registry) == 1
+
+
+def test_oldest_slide_is_evicted():
+    registry = slides.SlideRegistry(max_slides=2)
+    keys = [slides.frame_hash(thumb(seed)) for seed in (1, 2, 3)]
+    for key in keys:
+        registry.add(key, [], [])
+    assert registry.get("s1") is None
+    assert [registry.get(i) is not None for i in ("s2", "s3")] == [True, True]
+
+
+def test_export_restore_roundtrip():
+    registry = slides.SlideRegistry()
+    key = slides.frame_hash(thumb(1))
+    registry.add(key, ["Agenda"], ["menu"])
+    registry.add(slides.frame_hash(thumb(2)), ["Budget"], [])
+
+    restored = slides.SlideRegistry()
+    restored.restore(registry.export())
+    assert restored.current.id == "s2"
+    assert restored.get("s1").hash == key
+    assert restored.lookup(key).text == ["Agenda"]
+    assert restored.add(slides.frame_hash(thumb(3)), [], []).id == "s3"
@@ -0,0 +1,82 @@
+# server/tests/test_speculation.py
+# Pruebas unitarias de la respuesta especulativa del orchestrator (no requieren servicios arriba)
+import asyncio
+import pathlib
+import sys
+from types import SimpleNamespace
+
+# MeetingSession importa el resto del paquete `app` del orchestrator; ningún otro
+# test importa un `app`, así que se añade su directorio al path solo aquí
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "orchestrator-service"))
+
+from app.pipeline import MeetingSession  # noqa: E402
+from app.speculation import Speculation, similarity  # noqa: E402
+from app.telemetry import Telemetry  # noqa: E402
+
+PARTIAL = "can you share the link to the deck"
+
+
+def make_session() -> MeetingSession:
+    services = SimpleNamespace(telemetry=Telemetry("orchestrator-test"))
+    return MeetingSession(ws=None, services=services, gate=None, speculation_match=0.8)
+
+
+async def speculate(session: MeetingSession, partial: str = PARTIAL) -> Speculation:
+    task = asyncio.create_task(asyncio.sleep(10, result="respuesta"))
+    session._speculation = Speculation(partial, f"contexto {partial}", task)
+    session.speculation_stats.started += 1
+    return session._speculation
+
+
+def test_claim_hits_when_question_matches_partial():
+    question = "Can you share the link to the deck, please?"
+    assert similarity(PARTIAL, question) >= 0.8
+
+    async def run():
+        session = make_session()
+        spec = await speculate(session)
+        claimed = session._claim_speculation(question)
+        spec.task.cancel()
+        return session, spec, claimed
+    session, spec, claimed = asyncio.run(run())
+    assert claimed is spec
+    assert session._speculation is None
+    stats = session.speculation_stats.snapshot()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 0, 1.0)
+
+
+def test_claim_misses_and_cancels_below_threshold():
+    question = "who owns the budget review?"
+    assert similarity(PARTIAL, question) < 0.8
+
+    async def run():
+        session = make_session()
+        spec = await speculate(session)
+        claimed = session._claim_speculation(question)
+        await asyncio.gather(spec.task, return_exceptions=True)
+        return session, spec, claimed
+    session, spec, claimed = asyncio.run(run())
+    assert claimed is None
+    assert spec.task.cancelled()
+    stats = session.speculation_stats.snapshot()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (0, 1, 0.0)
+    assert stats["wasted_tokens_est"] == spec.prompt_tokens
+
+
+def test_claim_without_speculation_is_noop():
+    session = make_session()
+    assert session._claim_speculation("any question?") is None
+    assert session.speculation_stats.snapshot()["misses"] == 0
+
+
+def test_discard_counts_finished_answer_as_wasted():
+    async def run():
+        session = make_session()
+        task = asyncio.create_task(asyncio.sleep(0, result="x" * 40))
+        await task
+        session._speculation = Speculation(PARTIAL, "p" * 40, task)
+        session._discard_speculation()
+        return session
+    stats = asyncio.run(run()).speculation_stats.snapshot()
+    assert stats["misses"] == 1
+    assert stats["wasted_tokens_est"] == 20
@@ -0,0 +1,87 @@
+# server/tests/test_store.py
+# Pruebas unitarias del historial de reuniones en SQLite del orchestrator (no requieren servicios arriba)
+import asyncio
+import importlib.util
+import pathlib
+
+# Cada servicio tiene su propio paquete `app`: se carga el módulo por ruta para no mezclarlos
+_spec = importlib.util.spec_from_file_location(
+    "orchestrator_store",
+    pathlib.Path(__file__).parent.parent / "orchestrator-service" / "app" / "store.py"
+)
+store_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(store_module)
+
+
+def run_with_store(path, fill, query):
+    """Rellena un almacén nuevo, lo cierra (vuelca el writer) y lanza las consultas."""
+    async def run():
+        store = store_module.MeetingStore(str(path), flush_interval=0.01)
+        await store.start()
+        fill(store)
+        await store.close()
+        return await query(store_module.MeetingStore(str(path)))
+    return asyncio.run(run())
+
+
+def test_list_meetings_pages_through_shared_started_at(tmp_path):
+    def fill(store):
+        for i in range(5):
+            store.open_meeting(f"m{i}", started_at=1000.0)
+        store.open_meeting("newest", started_at=2000.0)
+
+    async def query(store):
+        pages, cursor = [], (None, None)
+        while True:
+            page = await store.list_meetings(limit=2, before=cursor[0], before_id=cursor[1])
+            if not page:
+                return pages
+            pages.append([m["id"] for m in page])
+            cursor = (page[-1]["started_at"], page[-1]["id"])
+
+    pages = run_with_store(tmp_path / "meetings.db", fill, query)
+    assert pages == [["newest", "m4"], ["m3", "m2"], ["m1", "m0"]]
+
+
+def test_events_filter_by_kind_and_speaker(tmp_path):
+    def fill(store):
+        store.open_meeting("m1")
+        store.append("m1", "transcript", "hola", speaker="A")
+        store.append("m1", "transcript", "buenas", speaker="B")
+        store.append("m1", "answer", "respuesta")
+
+    async def query(store):
+        by_speaker = await store.events("m1", speaker="B")
+        transcripts = await store.events("m1", kind="transcript")
+        after = await store.events("m1", after_id=transcripts[0]["id"], limit=1)
+        return by_speaker, transcripts, after
+
+    by_speaker, transcripts, after = run_with_store(tmp_path / "meetings.db", fill, query)
+    assert [e["text"] for e in by_speaker] == ["buenas"]
+    assert [e["text"] for e in transcripts] == ["hola", "buenas"]
+    assert [e["text"] for e in after] == ["buenas"]
+
+
+def test_search_indexes_transcript_and_ocr_only(tmp_path):
+    def fill(store):
+        store.open_meeting("m1")
+        store.open_meeting("m2")
+        store.append("m1", "transcript", "revisamos el presupuesto del trimestre")
+        store.append("m1", "ocr", "Presupuesto 2024")
+        store.append("m1", "answer", "el presupuesto está aprobado")
+        store.append("m2", "transcript", "la migración está en curso")
+
+    async def query(store):
+        return (
+            await store.search("presupuesto"),
+            await store.search("migracion"),
+            await store.search("presupuesto", meeting_id="m2"),
+            await store.search('"'),
+        )
+
+    budget, migration, other_meeting, quote = run_with_store(tmp_path / "meetings.db", fill, query)
+    assert sorted(e["kind"] for e in budget) == ["ocr", "transcript"]
+    assert "[presupuesto]" in next(e["snippet"] for e in budget if e["kind"] == "transcript")
+    assert [e["meeting_id"] for e in migration] == ["m2"]
+    assert other_meeting == []
+    assert quote == []